@@ -0,0 +1,75 @@
+"""Replicates per second of the bootstrap bands, vectorized against a per-replicate loop
+
+Usage: python -m benchmarks.bench_bootstrap [--sizes 1k,10k] [--replicates 200]
+                                            [--loop-replicates 10] [--repeat 3]
+
+The loop resamples the same residuals but averages each replicate with its
+own pandas ewm call, as a straightforward implementation would.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_pipeline import parse_size
+from benchmarks.synthetic import write_polls_csv
+from components.data_processing import preprocess_polls, filter_data
+from components.uncertainty import bootstrap_bands, BOOTSTRAP_REPLICATES
+from moving_average import HALFLIFE, PARTY_MAPPING, calculate_weighted_ma
+
+def loop_bootstrap(df, df_weighted_ma, replicates, seed=0):
+    """One resample and one pandas ewm per replicate and party"""
+    rng = np.random.default_rng(seed)
+    times = pd.DatetimeIndex(df['date'])
+    samples = []
+    for _ in range(replicates):
+        replicate = {}
+        for party, abbr in PARTY_MAPPING.items():
+            if party not in df.columns:
+                continue
+            values = df[party].to_numpy(dtype='float64')
+            average = df_weighted_ma[f'{abbr}_MA'].to_numpy(dtype='float64')
+            observed = ~np.isnan(values)
+            residuals = (values - average)[observed]
+            resampled = np.full(len(values), np.nan)
+            resampled[observed] = average[observed] + rng.choice(residuals, observed.sum())
+            replicate[abbr] = pd.Series(resampled).ewm(halflife=HALFLIFE, times=times).mean().to_numpy()
+        samples.append(replicate)
+    return samples
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1k,10k', help="comma separated row counts, e.g. 1k,10k,100k")
+    parser.add_argument('--replicates', type=int, default=BOOTSTRAP_REPLICATES)
+    parser.add_argument('--loop-replicates', type=int, default=10, help="replicates timed for the loop (0 skips it)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'method':<12} {'replicates':>10} {'seconds':>9} {'replicates/s':>13}")
+    for rows in [parse_size(size) for size in args.sizes.split(',') if size.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_polls_csv(os.path.join(tmp, 'italian_polls.csv'), rows)
+            df, party_columns = preprocess_polls(pd.read_csv(path))
+        df = filter_data(df, party_columns)
+        df_weighted_ma = calculate_weighted_ma(df)
+
+        methods = [('vectorized', args.replicates, lambda: bootstrap_bands(df, df_weighted_ma, args.replicates))]
+        if args.loop_replicates:
+            methods.append(('loop', args.loop_replicates, lambda: loop_bootstrap(df, df_weighted_ma, args.loop_replicates)))
+        for name, replicates, func in methods:
+            seconds = best_of(func, args.repeat)
+            print(f"{rows:>9} {name:<12} {replicates:>10} {seconds:>9.3f} {replicates / seconds:>13.1f}", flush=True)
+
+if __name__ == '__main__':
+    main()
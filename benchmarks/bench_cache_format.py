@@ -0,0 +1,78 @@
+"""Benchmark the columnar cache format against the old row-dict JSON + zlib format
+
+Usage: python -m benchmarks.bench_cache_format [--rows 5000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+
+from benchmarks.synthetic import write_polls_csv
+from components.data_processing import preprocess_polls, filter_data
+from moving_average import calculate_weighted_ma
+from utils.columnar import encode_frame, decode_frame
+
+def legacy_encode(df):
+    """The original convert_df_to_cacheable + compress_json write path"""
+    rows = [
+        {
+            'date': row['date'].strftime('%Y-%m-%d'),
+            **{
+                col: (
+                    float(val)
+                    if not pd.isna(val) and not isinstance(val, (str, pd.Timestamp))
+                    else str(val) if not pd.isna(val) else None
+                )
+                for col, val in row.items()
+                if col != 'date'
+            }
+        }
+        for _, row in df.iterrows()
+    ]
+    return zlib.compress(json.dumps(rows).encode())
+
+def legacy_decode(data):
+    """The original get_from_redis + DataFrame rebuild read path"""
+    df = pd.DataFrame(json.loads(zlib.decompress(data).decode()))
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_polls_csv(os.path.join(tmp, 'italian_polls.csv'), args.rows)
+        df, party_columns = preprocess_polls(pd.read_csv(path))
+    df = filter_data(df, party_columns)
+    frames = {'raw': df, 'ma': calculate_weighted_ma(df)}
+
+    formats = {
+        'json+zlib': (legacy_encode, legacy_decode),
+        'columnar': (encode_frame, decode_frame),
+        'columnar+zlib': (lambda f: encode_frame(f, compress=True), decode_frame),
+    }
+    print(f"{'frame':<6} {'format':<14} {'encode ms':>10} {'decode ms':>10} {'bytes':>10}")
+    for frame_name, frame in frames.items():
+        for format_name, (encode, decode) in formats.items():
+            encode_time, payload = best_of(encode, frame, args.repeat)
+            decode_time, _ = best_of(decode, payload, args.repeat)
+            print(f"{frame_name:<6} {format_name:<14} {encode_time * 1000:>10.2f} "
+                  f"{decode_time * 1000:>10.2f} {len(payload):>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Memory a worker holds for one dataset version, compact schema against the old one
+
+Usage: python -m benchmarks.bench_memory [--sizes 1k,10k,100k]
+
+The old schema kept float64 shares, pollster, client and date strings as
+Python strings, and the averages in a second frame repeating every poll
+column. The compact one (components/schema.py) has float32 shares,
+categorical metadata and a single frame for polls and averages. Each is
+encoded as the tiered cache stores it, then decoded the way a worker loading
+the version does; "worker" is what the decoded frames keep allocated.
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import parse_size
+from benchmarks.synthetic import write_polls_csv
+from components.data_processing import preprocess_polls, filter_data
+from components.schema import METADATA_COLUMNS
+from moving_average import calculate_weighted_ma, combine_frames, split_frames
+from utils.columnar import encode_frame, decode_frame
+
+def legacy_frames(df, df_weighted_ma):
+    """The two frames in the schema the dataset had before components/schema.py"""
+    def widen(frame):
+        return frame.astype({
+            column: 'str' if column in METADATA_COLUMNS else 'float64'
+            for column in frame.columns
+            if column in METADATA_COLUMNS or pd.api.types.is_float_dtype(frame[column])
+        })
+    return widen(df), widen(df_weighted_ma)
+
+def frame_bytes(*frames):
+    return sum(int(frame.memory_usage(index=True, deep=True).sum()) for frame in frames)
+
+def worker_bytes(payloads, load):
+    """Bytes still allocated once load() has decoded the payloads, with the frames alive"""
+    tracemalloc.start()
+    frames = load(payloads)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del frames
+    return held
+
+def schemas(df, df_weighted_ma):
+    """(name, stored frames, decode) of each schema"""
+    yield 'legacy', legacy_frames(df, df_weighted_ma), lambda payloads: [decode_frame(p) for p in payloads]
+    yield 'compact', [combine_frames(df, df_weighted_ma)], lambda payloads: split_frames(decode_frame(payloads[0]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1k,10k,100k', help="comma separated row counts, e.g. 1k,10k,1M")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'schema':<8} {'frames MiB':>11} {'worker MiB':>11} {'cached KiB':>11} {'vs legacy':>10}")
+    for rows in [parse_size(size) for size in args.sizes.split(',') if size.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_polls_csv(os.path.join(tmp, 'italian_polls.csv'), rows)
+            df, party_columns = preprocess_polls(pd.read_csv(path))
+        df = filter_data(df, party_columns)
+        df_weighted_ma = calculate_weighted_ma(df)
+
+        baseline = None
+        for name, frames, load in schemas(df, df_weighted_ma):
+            payloads = [encode_frame(frame, compress=True) for frame in frames]
+            held = worker_bytes(payloads, load)
+            baseline = baseline or held
+            print(f"{rows:>9} {name:<8} {frame_bytes(*frames) / 2**20:>11.2f} {held / 2**20:>11.2f} "
+                  f"{sum(len(p) for p in payloads) / 1024:>11.1f} {held / baseline:>9.0%}", flush=True)
+
+if __name__ == '__main__':
+    main()
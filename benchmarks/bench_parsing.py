@@ -0,0 +1,65 @@
+"""Benchmark the vectorized percentage parser against the old per-cell loop
+
+Usage: python -m benchmarks.bench_parsing [--rows 100000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_polls_csv
+from components.data_processing import preprocess_polls
+
+def legacy_preprocess(df):
+    """The original iterrows/df.at implementation, kept here as the reference"""
+    df['date'] = pd.to_datetime(df['Data Inserimento'], format='%d/%m/%Y')
+    df = df[['date'] + [col for col in df.columns if col != 'date']]
+    all_party_columns = df.columns[df.columns.get_loc('Partito Democratico'):]
+    # pandas >= 3 infers a strict string dtype that rejects float writes
+    df = df.astype({party: object for party in all_party_columns})
+    for party in all_party_columns:
+        for i, row in df.iterrows():
+            if isinstance(row[party], str):
+                try:
+                    df.at[i, party] = float(row[party].replace("%", "").replace(",", "."))
+                except ValueError:
+                    df.at[i, party] = None
+            elif isinstance(row[party], int):
+                df.at[i, party] = float(row[party])
+    return df, all_party_columns
+
+def time_call(func, raw):
+    start = time.perf_counter()
+    result = func(raw.copy())
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--skip-legacy', action='store_true', help="only time the vectorized parser")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_polls_csv(os.path.join(tmp, 'italian_polls.csv'), args.rows)
+        raw = pd.read_csv(path)
+
+    new_time, (new_df, columns) = time_call(preprocess_polls, raw)
+    print(f"vectorized: {new_time * 1000:9.1f} ms  ({args.rows} rows, {len(columns)} parties)")
+    if args.skip_legacy:
+        return
+
+    old_time, (old_df, _) = time_call(legacy_preprocess, raw)
+    print(f"legacy:     {old_time * 1000:9.1f} ms")
+    print(f"speedup:    {old_time / new_time:9.1f}x")
+
+    for party in columns:
+        old = pd.to_numeric(old_df[party], errors='coerce').to_numpy(dtype='float64')
+        if not np.allclose(old, new_df[party].to_numpy(), equal_nan=True):
+            raise SystemExit(f"mismatch in column {party}")
+    print("results match")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Time and memory-profile every stage of the poll pipeline on synthetic data
+
+Usage: uv run --frozen python -m benchmarks.bench_pipeline [--sizes 1k,10k,100k] [--repeat 3]
+                                                           [--output results.json]
+                                                           [--baseline benchmarks/baseline.json]
+                                                           [--save-baseline] [--tolerance 0.25]
+
+Runs offline: the polls come from benchmarks.synthetic and are read through a
+LocalPollSource with throwaway state files. Each stage is timed best-of-repeat
+and then run once more under tracemalloc for its peak allocation. Results are
+written as JSON and compared with the committed baseline: stages slower than
+baseline * (1 + tolerance), and by more than MIN_SLOWDOWN_MS, are reported and
+the exit status is 1. Stages in NOISY_STAGES get at least their own, wider
+tolerance. A missing baseline, one recorded with other VERSIONED libraries,
+or one sharing no stage with the run exits with 2. --save-baseline replaces
+it instead; record it in the uv.lock environment, on the machine the
+comparison runs on.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from fasthtml.common import to_xml
+
+from benchmarks.synthetic import write_polls_csv
+from config.party_config import PARTY_CONFIG
+from components.chart_payload import build_chart_payload, build_home_summary
+from components.charts import create_chart_scripts
+from components.daily_index import build_daily_index
+from components.data_processing import preprocess_polls, filter_data, select_chart_rows, prepare_chart_datasets
+from components.og_image import render_og_image
+from components.point_budgets import DEFAULT_POINT_BUDGET
+from components.poll_source import LocalPollSource
+from components.uncertainty import bootstrap_bands
+from moving_average import calculate_weighted_ma, build_ewma_state, build_smoothed_averages
+from utils.columnar import encode_frame, decode_frame
+
+DEFAULT_SIZES = '1k,10k,100k'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Sub-millisecond stages jitter by more than any sensible tolerance
+MIN_SLOWDOWN_MS = 1.0
+# Stage -> the least tolerance it is compared with
+NOISY_STAGES = {
+    'render_og_image': 1.0,  # Pillow text layout, slow on the first run in a process
+    'bootstrap_bands': 0.5,  # allocation-heavy resampling
+    'build_ewma_state': 0.5,
+}
+# environment() entries a baseline is only comparable under
+VERSIONED = ('python', 'pandas', 'numpy', 'pillow')
+
+def parse_size(text):
+    """'1k' -> 1000, '1M' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+def load_stage(path, tmp):
+    """load_and_preprocess_data() against a local file, from a cold source state"""
+    def run():
+        state_file = os.path.join(tmp, 'poll_source.json')
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        source = LocalPollSource(path, state_file=state_file, content_file=os.path.join(tmp, 'poll_source.csv'))
+        return source.load(preprocess_polls)
+    return run
+
+def chart_datasets_stage(df, df_weighted_ma):
+    def run():
+        series = [df_weighted_ma[f'{abbr}_MA'] for abbr, config in PARTY_CONFIG.items() if config['show_in_graph']]
+        rows = select_chart_rows(df_weighted_ma, series, DEFAULT_POINT_BUDGET)
+        return prepare_chart_datasets(df, df_weighted_ma.iloc[rows], PARTY_CONFIG, DEFAULT_POINT_BUDGET)
+    return run
+
+def pipeline_stages(path, tmp):
+    """Yield (name, callable) in pipeline order; each stage feeds the next"""
+    df, party_columns = load_stage(path, tmp)()
+    yield 'load_and_preprocess_data', load_stage(path, tmp)
+
+    yield 'filter_data', lambda: filter_data(df, party_columns)
+    df = filter_data(df, party_columns)
+
+    yield 'calculate_weighted_ma', lambda: calculate_weighted_ma(df)
+    yield 'build_ewma_state', lambda: build_ewma_state(df)
+    yield 'build_smoothed_averages', lambda: build_smoothed_averages(df)
+    df_weighted_ma = calculate_weighted_ma(df)
+    yield 'bootstrap_bands', lambda: bootstrap_bands(df, df_weighted_ma)
+
+    yield 'prepare_chart_datasets', chart_datasets_stage(df, df_weighted_ma)
+    yield 'build_chart_payload', lambda: build_chart_payload(df, df_weighted_ma, DEFAULT_POINT_BUDGET)
+    payload = build_chart_payload(df, df_weighted_ma, DEFAULT_POINT_BUDGET)
+    yield 'build_daily_index', lambda: build_daily_index(df_weighted_ma)
+    summary, index = build_home_summary(df_weighted_ma), build_daily_index(df_weighted_ma)
+    yield 'render_og_image', lambda: render_og_image(summary, index)
+
+    # encode_frame replaced convert_df_to_cacheable as the Redis write path
+    yield 'encode_frame', lambda: encode_frame(df, compress=True)
+    encoded = encode_frame(df, compress=True)
+    yield 'decode_frame', lambda: decode_frame(encoded)
+
+    yield 'create_chart_scripts', lambda: to_xml(create_chart_scripts(payload))
+
+def measure(func, repeat):
+    """Best and mean wall time over repeat runs, then peak traced allocation of one more"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'best_s': min(times), 'mean_s': sum(times) / len(times), 'peak_bytes': peak}
+
+def run_benchmarks(sizes, repeat, seed=0):
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_polls_csv(os.path.join(tmp, 'italian_polls.csv'), rows, seed=seed)
+            for stage, func in pipeline_stages(path, tmp):
+                result = {'rows': rows, 'stage': stage, **measure(func, repeat)}
+                results.append(result)
+                print(f"{rows:>9} {stage:<26} {result['best_s'] * 1000:>10.2f} ms "
+                      f"{result['peak_bytes'] / 2**20:>9.1f} MiB", flush=True)
+    return results
+
+def environment():
+    try:
+        import PIL
+        pillow = PIL.__version__
+    except ImportError:
+        pillow = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pillow': pillow,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+def compare(results, baseline, tolerance):
+    """Return the number of stages compared and the (rows, stage, ratio) of those slower than allowed"""
+    reference = {(r['rows'], r['stage']): r for r in baseline['results']}
+    compared, regressions = 0, []
+    print(f"\n{'rows':>9} {'stage':<26} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}")
+    for result in results:
+        before = reference.get((result['rows'], result['stage']))
+        if before is None:
+            continue
+        compared += 1
+        ratio = result['best_s'] / max(before['best_s'], 1e-9)
+        slower = (ratio > 1 + max(tolerance, NOISY_STAGES.get(result['stage'], 0))
+                  and (result['best_s'] - before['best_s']) * 1000 > MIN_SLOWDOWN_MS)
+        flag = '  <-- slower' if slower else ''
+        print(f"{result['rows']:>9} {result['stage']:<26} {before['best_s'] * 1000:>12.2f} "
+              f"{result['best_s'] * 1000:>10.2f} {ratio:>6.2f}x{flag}")
+        if slower:
+            regressions.append((result['rows'], result['stage'], ratio))
+    return compared, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated row counts, e.g. 1k,10k,1M")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before a stage is flagged")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    report = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed,
+              'results': run_benchmarks(sizes, args.repeat, args.seed)}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(2)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatched = [
+        f"{name} {baseline['environment'].get(name)} (now {report['environment'][name]})"
+        for name in VERSIONED if baseline['environment'].get(name) != report['environment'][name]
+    ]
+    if mismatched:
+        print(f"\nThe baseline was recorded with {', '.join(mismatched)}; "
+              "run under uv run --frozen, or with --save-baseline to replace it")
+        sys.exit(2)
+    compared, regressions = compare(report['results'], baseline, args.tolerance)
+    if not compared:
+        print("\nThe baseline has none of these sizes; run with --save-baseline to add them")
+        sys.exit(2)
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+    print(f"\nNo stage regressed by more than {args.tolerance:.0%}")
+
+if __name__ == '__main__':
+    main()
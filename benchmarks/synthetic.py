@@ -0,0 +1,53 @@
+"""Synthetic poll data matching the schema of italian_polls.csv"""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+PARTY_COLUMNS = [
+    'Partito Democratico', "Fratelli d'Italia", 'Movimento 5 Stelle', 'Forza Italia', 'Lega',
+    'Alleanza Verdi Sinistra', '+Europa', 'Azione', 'Italia Viva', 'Altri'
+]
+PARTY_SHARES = [22.0, 28.5, 11.0, 8.5, 8.5, 6.5, 2.0, 2.5, 2.0, 8.5]
+POLLSTERS = ['SWG', 'Tecnè', 'EMG', 'Ipsos', 'Demos', 'Euromedia', 'Noto', 'Piepoli', 'Quorum', 'Ixè']
+
+def _format_unique(values, format_value):
+    """Format each distinct value once; there are few of them even in a million rows"""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    formatted = np.empty(len(uniques), dtype=object)
+    formatted[:] = [format_value(v) for v in uniques]
+    return formatted[inverse]
+
+def generate_polls(n_rows, seed=0, end_date=None):
+    """Build a raw poll frame with Italian decimal commas, "%" suffixes and mixed cell types"""
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.now()
+    offsets = np.sort(rng.integers(0, 3 * 365, n_rows))[::-1]
+    dates = _format_unique(offsets, lambda d: (end_date - timedelta(days=int(d))).strftime('%d/%m/%Y'))
+
+    data = {
+        'Data Inserimento': dates,
+        'Realizzatore': rng.choice(POLLSTERS, n_rows),
+        'Committente': rng.choice(['Rai', 'Mediaset', 'La7', 'Corriere della Sera'], n_rows),
+    }
+    for party, share in zip(PARTY_COLUMNS, PARTY_SHARES):
+        values = np.round(rng.normal(share, 1.0, n_rows).clip(0), 1)
+        kind = rng.random(n_rows)
+        cells = np.empty(n_rows, dtype=object)
+        as_text = kind < 0.6
+        cells[as_text] = _format_unique(values[as_text], lambda v: f"{v:.1f}%".replace('.', ','))
+        as_plain = (kind >= 0.6) & (kind < 0.8)
+        cells[as_plain] = _format_unique(values[as_plain], lambda v: f"{v:.1f}".replace('.', ','))
+        as_int = (kind >= 0.8) & (kind < 0.9)
+        cells[as_int] = _format_unique(values[as_int], int)
+        as_float = (kind >= 0.9) & (kind < 0.97)
+        cells[as_float] = values[as_float]
+        as_garbage = (kind >= 0.97) & (kind < 0.99)
+        cells[as_garbage] = 'n.d.'
+        cells[kind >= 0.99] = None
+        data[party] = cells
+    return pd.DataFrame(data)
+
+def write_polls_csv(path, n_rows, seed=0):
+    """Write a synthetic italian_polls.csv to path and return the path"""
+    generate_polls(n_rows, seed=seed).to_csv(path, index=False)
+    return path
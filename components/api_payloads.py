@@ -0,0 +1,66 @@
+"""JSON bodies of the data API, built from a dataset snapshot"""
+import json
+
+import pandas as pd
+
+from config.party_config import PARTY_CONFIG
+from components.chart_payload import build_chart_payload
+from components.coalitions import calculate_coalition_series
+from components.schema import as_float64, date_column
+
+POLL_METADATA_COLUMNS = {'Realizzatore': 'pollster', 'Committente': 'client'}
+
+def filter_dates(df, start, end):
+    mask = pd.Series(True, index=df.index)
+    dates = date_column(df)
+    if start:
+        mask &= dates >= pd.Timestamp(start)
+    if end:
+        mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    return df[mask]
+
+def polls_frame(snapshot, start, end, parties):
+    df = filter_dates(snapshot.df, start, end)
+    columns = {'date': date_column(df).dt.strftime('%Y-%m-%d')}
+    for source, name in POLL_METADATA_COLUMNS.items():
+        if source in df.columns:
+            columns[name] = df[source]
+    for abbr in parties:
+        if PARTY_CONFIG[abbr]['name'] in df.columns:
+            columns[abbr] = as_float64(df[PARTY_CONFIG[abbr]['name']])
+    return pd.DataFrame(columns)
+
+def averages_frame(snapshot, start, end, parties):
+    df = filter_dates(snapshot.df_weighted_ma, start, end)
+    columns = {'date': date_column(df).dt.strftime('%Y-%m-%d')}
+    for abbr in parties:
+        if f'{abbr}_MA' in df.columns:
+            columns[abbr] = df[f'{abbr}_MA'].astype('float64').round(2)
+    return pd.DataFrame(columns)
+
+def coalitions_frame(snapshot, start, end, coalitions):
+    df = filter_dates(snapshot.df_weighted_ma, start, end)
+    coalition_data, _ = calculate_coalition_series(df) if len(df) else ({}, {})
+    columns = {'date': date_column(df).dt.strftime('%Y-%m-%d')}
+    for coalition in coalitions:
+        columns[coalition] = coalition_data.get(coalition, [])
+    return pd.DataFrame(columns)
+
+FRAME_BUILDERS = {'polls': polls_frame, 'averages': averages_frame, 'coalitions': coalitions_frame}
+
+def render_payload(snapshot, name, start, end, selected):
+    """The body of /api/<name> for the given filters"""
+    frame = FRAME_BUILDERS[name](snapshot, start, end, selected)
+    return (
+        '{"version":' + json.dumps(snapshot.version)
+        + ',"from":' + json.dumps(start.isoformat() if start else None)
+        + ',"to":' + json.dumps(end.isoformat() if end else None)
+        + ',"series":' + json.dumps(selected)
+        + ',"data":' + frame.to_json(orient='records')
+        + '}'
+    )
+
+def render_chart_payload(snapshot, max_points, bands=None):
+    """The body of /api/chart, the payload the home page charts are drawn from"""
+    payload = build_chart_payload(snapshot.df, snapshot.df_weighted_ma, max_points, bands=bands)
+    return json.dumps(payload, separators=(',', ':'))
@@ -0,0 +1,101 @@
+"""Compact, index-based wire format for the chart datasets
+
+Every series refers to one shared date axis, sent as delta-encoded day offsets
+from an epoch. Line series carry one value per axis day (null for gaps); poll
+series carry delta-encoded axis indices and their values. Values are integers
+in tenths of a percent. decodeChartPayload() in components/charts.py turns the
+payload back into Chart.js datasets.
+"""
+from datetime import date
+import math
+
+import numpy as np
+
+from config.party_config import PARTY_CONFIG
+from components.coalitions import calculate_coalition_series, prepare_coalition_datasets
+from components.data_processing import prepare_chart_datasets, select_chart_rows
+from components.schema import date_column
+from components.uncertainty import prepare_band_datasets
+
+PAYLOAD_VERSION = 1
+VALUE_SCALE = 10
+
+def _scaled(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return int(round(value * VALUE_SCALE))
+
+def _deltas(values):
+    return np.diff(values, prepend=0).tolist() if len(values) else []
+
+def encode_chart_payload(dates, datasets, coalition_datasets):
+    """Encode the datasets built for Chart.js; dates labels the line series"""
+    point_dates = [point['x'] for dataset in datasets if _is_points(dataset) for point in dataset['data']]
+    ordinals = {d: date.fromisoformat(d).toordinal() for d in set(dates) | set(point_dates)}
+    epoch = min(ordinals.values()) if ordinals else date.today().toordinal()
+    axis = np.array(sorted({ordinal - epoch for ordinal in ordinals.values()}), dtype=np.int64)
+    index_of = {d: int(np.searchsorted(axis, ordinal - epoch)) for d, ordinal in ordinals.items()}
+    label_indices = [index_of[d] for d in dates]
+
+    def encode_line(dataset):
+        values = [None] * len(axis)
+        # Several rows can share a day; the last one is the average at the end of it
+        for i, value in zip(label_indices, dataset['data']):
+            values[i] = _scaled(value)
+        return {'style': _style(dataset), 'values': values}
+
+    def encode_points(dataset):
+        return {
+            'style': _style(dataset),
+            'at': _deltas([index_of[point['x']] for point in dataset['data']]),
+            'values': [_scaled(point['y']) for point in dataset['data']],
+        }
+
+    return {
+        'format': PAYLOAD_VERSION,
+        'epoch': date.fromordinal(epoch).isoformat(),
+        'scale': VALUE_SCALE,
+        'days': _deltas(axis),
+        'datasets': [encode_points(d) if _is_points(d) else encode_line(d) for d in datasets],
+        'coalitions': [encode_line(d) for d in coalition_datasets],
+    }
+
+def _is_points(dataset):
+    return bool(dataset['data']) and isinstance(dataset['data'][0], dict)
+
+def _style(dataset):
+    return {key: value for key, value in dataset.items() if key != 'data'}
+
+def build_home_summary(df_weighted_ma, party_config=PARTY_CONFIG):
+    """Latest figures listed next to the home page charts, as plain values"""
+    latest_values = df_weighted_ma.iloc[-1]
+    _, latest_coalitions = calculate_coalition_series(df_weighted_ma)
+    return {
+        'latest_date': date_column(df_weighted_ma).max().strftime('%d/%m/%Y'),
+        'parties': {abbr: float(latest_values[f'{abbr}_MA']) for abbr in party_config},
+        'coalitions': latest_coalitions,
+    }
+
+def build_chart_payload(df, df_weighted_ma, max_points, party_config=PARTY_CONFIG, bands=None):
+    """Downsample and encode everything the two home page charts plot
+
+    bands, from components.uncertainty, adds a shaded band around every line.
+    """
+    coalition_data, _ = calculate_coalition_series(df_weighted_ma)
+
+    # Lines share one date axis, so they are downsampled to a common set of rows
+    line_series = [df_weighted_ma[f'{abbr}_MA'] for abbr, config in party_config.items() if config['show_in_graph']]
+    rows = select_chart_rows(df_weighted_ma, line_series + list(coalition_data.values()), max_points)
+    chart_ma = df_weighted_ma.iloc[rows]
+    dates = date_column(chart_ma).dt.strftime('%Y-%m-%d').tolist()
+    datasets = prepare_chart_datasets(df, chart_ma, party_config, max_points)
+    if bands is not None:
+        datasets = [
+            band
+            for abbr, config in party_config.items() if config['show_in_graph']
+            for band in prepare_band_datasets(bands, rows, abbr, config['color'])
+        ] + datasets
+    coalition_datasets = prepare_coalition_datasets(
+        {coalition: [series[i] for i in rows] for coalition, series in coalition_data.items()}
+    )
+    return encode_chart_payload(dates, datasets, coalition_datasets)
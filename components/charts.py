@@ -1,15 +1,46 @@
 from fasthtml.common import *
 import json
 
-def create_chart_scripts(dates, datasets, coalition_datasets):
-    assert isinstance(dates, list), "dates must be a list"
-    assert len(dates) > 0, "dates list cannot be empty"
+DECODE_CHART_PAYLOAD_JS = """
+    // Expand the compact payload from components/chart_payload.py into Chart.js datasets
+    function decodeChartPayload(payload) {
+        const dayMs = 24 * 60 * 60 * 1000;
+        const epoch = Date.parse(payload.epoch);
+        let day = 0;
+        const labels = payload.days.map(delta => {
+            day += delta;
+            return new Date(epoch + day * dayMs).toISOString().slice(0, 10);
+        });
+        const scale = value => value === null ? null : value / payload.scale;
+        const line = series => Object.assign({}, series.style, {
+            data: series.values.map(scale),
+            spanGaps: true
+        });
+        const points = series => {
+            let index = 0;
+            return Object.assign({}, series.style, {
+                data: series.at.map((delta, k) => {
+                    index += delta;
+                    return {x: labels[index], y: scale(series.values[k])};
+                })
+            });
+        };
+        return {
+            dates: labels,
+            datasets: payload.datasets.map(series => series.at ? points(series) : line(series)),
+            coalitionDatasets: payload.coalitions.map(line)
+        };
+    }
+"""
+
+def create_chart_scripts(payload):
+    assert payload['days'], "chart payload cannot be empty"
     
     base_chart_config = {
         "type": "line",
         "data": {
-            "labels": dates,
-            "datasets": datasets
+            "labels": [],
+            "datasets": []
         },
         "options": {
             "responsive": True,
@@ -73,11 +104,12 @@ def create_chart_scripts(dates, datasets, coalition_datasets):
     }
 
     return [
-        Script("""
+        Script(DECODE_CHART_PAYLOAD_JS + """
             function createPollChartConfig(dates, datasets, isCoalition) {
                 const chartConfig = """ + json.dumps(base_chart_config) + """;
                 
-                // Set the correct datasets
+                // Set the shared date axis and the correct datasets
+                chartConfig.data.labels = dates;
                 chartConfig.data.datasets = datasets;
                 
                 // Adjust y-axis max based on chart type
@@ -88,9 +120,9 @@ def create_chart_scripts(dates, datasets, coalition_datasets):
                     return value + '%';
                 };
                 
-                // Hide poll point datasets from legend
+                // Hide poll point and uncertainty band datasets from legend
                 chartConfig.options.plugins.legend.labels.filter = function(item) {
-                    return !item.text.endsWith('(polls)');
+                    return !item.text.endsWith('(polls)') && !item.text.endsWith('(band)');
                 };
                 
                 // Update tooltip configuration
@@ -108,7 +140,7 @@ def create_chart_scripts(dates, datasets, coalition_datasets):
                             });
                         },
                         label: function(context) {
-                            if (context.dataset.label.includes('(polls)')) return null;
+                            if (context.dataset.label.includes('(polls)') || context.dataset.label.includes('(band)')) return null;
                             return `${context.dataset.label}: ${context.parsed.y.toFixed(1)}%`;
                         }
                     },
@@ -128,9 +160,7 @@ def create_chart_scripts(dates, datasets, coalition_datasets):
         """),
         
         Script(f"""
-            const dates = {json.dumps(dates)};
-            const datasets = {json.dumps(datasets)};
-            const coalitionDatasets = {json.dumps(coalition_datasets)};
+            const {{dates, datasets, coalitionDatasets}} = decodeChartPayload({json.dumps(payload, separators=(',', ':'))});
             
             // Initialize poll chart
             const pollCtx = document.getElementById('pollChart').getContext('2d');
@@ -0,0 +1,49 @@
+"""Functions for aggregating party averages into coalitions"""
+import numpy as np
+from config.party_config import COALITION_CONFIG
+
+def build_coalition_matrix(columns, coalition_config=COALITION_CONFIG):
+    """Build the (party x coalition) weight matrix over the `_MA` columns that exist"""
+    coalitions = list(coalition_config)
+    ma_columns = sorted({
+        f'{party}_MA'
+        for config in coalition_config.values()
+        for party in config['parties']
+        if f'{party}_MA' in columns
+    })
+    weights = np.zeros((len(ma_columns), len(coalitions)))
+    for j, coalition in enumerate(coalitions):
+        for party in coalition_config[coalition]['parties']:
+            if f'{party}_MA' in columns:
+                weights[ma_columns.index(f'{party}_MA'), j] = 1.0
+    return ma_columns, coalitions, weights
+
+def calculate_coalition_series(df_weighted_ma, coalition_config=COALITION_CONFIG):
+    """Compute every coalition series and its latest value with a single matrix multiply
+
+    Parties without an `_MA` column are left out of their coalition, while a NaN
+    average makes the coalition NaN for that row, as summing the row would.
+    """
+    ma_columns, coalitions, weights = build_coalition_matrix(df_weighted_ma.columns, coalition_config)
+    values = df_weighted_ma[ma_columns].to_numpy(dtype='float64')
+    missing = np.isnan(values)
+    totals = np.where(missing, 0.0, values) @ weights
+    totals[(missing.astype('float64') @ weights) > 0] = np.nan
+
+    coalition_data = {
+        coalition: [round(value, 1) for value in totals[:, j].tolist()]
+        for j, coalition in enumerate(coalitions)
+    }
+    latest_values = {coalition: series[-1] for coalition, series in coalition_data.items()}
+    return coalition_data, latest_values
+
+def prepare_coalition_datasets(coalition_data, coalition_config=COALITION_CONFIG):
+    """Prepare datasets for the coalition chart"""
+    return [
+        {
+            'label': coalition, 'data': coalition_data[coalition],
+            'borderColor': config['color'], 'backgroundColor': config['color'],
+            'borderWidth': 2, 'tension': 0.4, 'fill': False, 'pointRadius': 0
+        }
+        for coalition, config in coalition_config.items()
+    ]
@@ -0,0 +1,116 @@
+"""Party and coalition averages at the end of every day
+
+A dense array with one row per calendar day from the first poll to the last.
+Between polls the average does not move, so days without a poll carry the
+previous day's values forward and "as of date X" is a single offset from the
+first day. Lookups need neither pandas nor NumPy, so the index is also
+stored in the precomputed artifact.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+
+@dataclass
+class DailyIndex:
+    """Averages of every party and coalition, one row per day"""
+    first_day: int  # date ordinal of row 0
+    parties: list
+    coalitions: list
+    values: list  # one row per day: parties then coalitions, None before a series starts
+    poll_days: list  # ordinals of the days with at least one poll
+
+    @property
+    def first_date(self):
+        return date.fromordinal(self.first_day)
+
+    @property
+    def last_date(self):
+        return date.fromordinal(self.first_day + len(self.values) - 1)
+
+    def offset(self, day):
+        """Row of day; days after the last poll map to the last row, days before the first to None"""
+        offset = day.toordinal() - self.first_day
+        if offset < 0 or not self.values:
+            return None
+        return min(offset, len(self.values) - 1)
+
+    def as_of(self, day):
+        """Averages at the end of day, or None before the first poll"""
+        offset = self.offset(day)
+        if offset is None:
+            return None
+        row = self.values[offset]
+        last_poll = self.poll_days[bisect_right(self.poll_days, self.first_day + offset) - 1]
+        return {
+            'date': date.fromordinal(self.first_day + offset).isoformat(),
+            'last_poll': date.fromordinal(last_poll).isoformat(),
+            'parties': dict(zip(self.parties, row)),
+            'coalitions': dict(zip(self.coalitions, row[len(self.parties):])),
+        }
+
+    def summary_as_of(self, day):
+        """as_of() in the shape of chart_payload.build_home_summary()"""
+        averages = self.as_of(day)
+        if averages is None:
+            return None
+        return {
+            'latest_date': date.fromisoformat(averages['last_poll']).strftime('%d/%m/%Y'),
+            'parties': averages['parties'],
+            'coalitions': averages['coalitions'],
+        }
+
+    def change(self, start, end):
+        """Change of every average from the end of start to the end of end"""
+        before, after = self.offset(start), self.offset(end)
+        if before is None or after is None:
+            return None
+        deltas = [
+            round(b - a, 2) if a is not None and b is not None else None
+            for a, b in zip(self.values[before], self.values[after])
+        ]
+        return {
+            'parties': dict(zip(self.parties, deltas)),
+            'coalitions': dict(zip(self.coalitions, deltas[len(self.parties):])),
+        }
+
+    def to_json(self):
+        return {
+            'first_day': self.first_day,
+            'parties': self.parties,
+            'coalitions': self.coalitions,
+            'values': self.values,
+            'poll_days': self.poll_days,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['first_day'], data['parties'], data['coalitions'], data['values'], data['poll_days'])
+
+def build_daily_index(df_weighted_ma, party_config=None):
+    """Index the `_MA` columns and coalition series of a date-sorted average frame"""
+    import numpy as np
+    from config.party_config import PARTY_CONFIG
+    from components.coalitions import calculate_coalition_series
+    from components.schema import date_column
+    from components.uncertainty import day_end_rows
+
+    party_config = party_config or PARTY_CONFIG
+    parties = [abbr for abbr in party_config if f'{abbr}_MA' in df_weighted_ma.columns]
+    coalition_data, _ = calculate_coalition_series(df_weighted_ma)
+    dates = date_column(df_weighted_ma)
+    rows = day_end_rows(dates)
+    if len(rows) == 0:
+        return DailyIndex(date.today().toordinal(), parties, list(coalition_data), [], [])
+
+    # Ordinal of 1970-01-01, to turn datetime64 days into date ordinals
+    unix_epoch = date(1970, 1, 1).toordinal()
+    poll_days = dates.to_numpy()[rows].astype('datetime64[D]').astype('int64') + unix_epoch
+    series = np.column_stack([
+        df_weighted_ma[[f'{abbr}_MA' for abbr in parties]].to_numpy(dtype='float64')[rows],
+        np.array([coalition_data[coalition] for coalition in coalition_data], dtype='float64').T[rows].reshape(len(rows), -1),
+    ])
+    # Each calendar day takes the row of the last poll day on or before it
+    days = np.arange(poll_days[0], poll_days[-1] + 1)
+    dense = series[np.searchsorted(poll_days, days, side='right') - 1].round(2)
+    values = np.where(np.isnan(dense), None, dense).tolist()
+    return DailyIndex(int(poll_days[0]), parties, list(coalition_data), values, poll_days.tolist())
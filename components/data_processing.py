@@ -1,12 +1,31 @@
 """Functions for loading and preprocessing polling data"""
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from components.poll_source import get_poll_source
+from components.downsampling import shared_indices, thin_points
+from components.schema import PARTY_DTYPE, compact_metadata, as_float64, date_column
 
-def load_and_preprocess_data():
-    """Load and preprocess polling data"""
-    # Read polling data from the repo
-    df = pd.read_csv('https://raw.githubusercontent.com/ruggsea/llm_italian_poll_scraper/main/italian_polls.csv')
-    
+def parse_percentage_column(values):
+    """Parse a column of "12,3%" / numeric / garbage cells into PARTY_DTYPE, NaN when unparseable"""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(PARTY_DTYPE)
+    # Poll figures repeat a lot, so only the distinct cells go through the string ops
+    codes, uniques = pd.factorize(values)
+    cleaned = (
+        pd.Series(uniques, dtype=object).astype('string')
+        .str.replace('%', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .str.strip()
+    )
+    parsed = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    result = np.full(len(codes), np.nan, dtype=PARTY_DTYPE)
+    present = codes >= 0
+    result[present] = parsed[codes[present]]
+    return pd.Series(result, index=values.index, name=values.name)
+
+def preprocess_polls(df):
+    """Convert dates, parse every party column a whole column at a time and apply the compact schema"""
     # Convert date column - using Data Inserimento
     df['date'] = pd.to_datetime(df['Data Inserimento'], format='%d/%m/%Y')
     df = df[['date'] + [col for col in df.columns if col != 'date']]
@@ -15,36 +34,119 @@ def load_and_preprocess_data():
     all_party_columns = df.columns[df.columns.get_loc('Partito Democratico'):]
     
     # Convert percentages to floats
-    for party in all_party_columns:
-        for i, row in df.iterrows():
-            if isinstance(row[party], str):
-                try:
-                    df.at[i, party] = float(row[party].replace("%", "").replace(",", "."))
-                except ValueError:
-                    df.at[i, party] = None
-            elif isinstance(row[party], int):
-                df.at[i, party] = float(row[party])
+    parsed = {party: parse_percentage_column(df[party]) for party in all_party_columns}
+    df = compact_metadata(df.assign(**parsed))
     
     return df, all_party_columns
 
-def filter_data(df, all_party_columns):
+def load_and_preprocess_data():
+    """Load and preprocess polling data"""
+    # Read polling data from the configured source, re-parsing only what changed
+    return get_poll_source().load(preprocess_polls)
+
+KEY_PARTIES = ('Partito Democratico', "Fratelli d'Italia")
+TOTAL_RANGE = (90, 110)  # exclusive bounds of the sum of a poll's figures
+MAX_POLL_AGE = timedelta(days=3 * 365)
+# The source only records when a poll was inserted, so a re-insert can carry a later date
+DUPLICATE_WINDOW = np.timedelta64(7, 'D')
+# In the order a rejected poll is attributed to them
+REJECTION_REASONS = ('missing_key_parties', 'total_out_of_range', 'too_old', 'duplicate')
+
+def normalize_pollster(values):
+    """Pollster names without case or spacing differences"""
+    # Few distinct pollsters, so only those go through the string ops
+    codes, uniques = pd.factorize(values)
+    normalized = pd.Series(uniques, dtype=object).astype('string').str.split().str.join(' ').str.casefold()
+    return np.where(codes >= 0, normalized.to_numpy(dtype=object, na_value='')[codes], '')
+
+def poll_identity_hashes(pollsters, figures):
+    """64-bit hash of each poll's pollster and figures (one row per poll) to one decimal"""
+    identity = pd.DataFrame({'pollster': normalize_pollster(pollsters)})
+    identity = identity.join(pd.DataFrame(figures.round(1)))
+    return pd.util.hash_pandas_object(identity, index=False).to_numpy()
+
+def duplicate_mask(hashes, dates):
+    """Which polls repeat the identity of one inserted at most DUPLICATE_WINDOW earlier
+
+    The earliest copy is kept, the first in row order among copies of the
+    same day.
+    """
+    order = np.lexsort((dates, hashes))
+    same = hashes[order][1:] == hashes[order][:-1]
+    close = np.diff(dates[order]) <= DUPLICATE_WINDOW
+    duplicate = np.zeros(len(hashes), dtype=bool)
+    duplicate[order[1:]] = same & close
+    return duplicate
+
+def validate_polls(df, all_party_columns, now=None):
+    """Mask of the polls to keep and how many were rejected for each of REJECTION_REASONS
+
+    The checks combine into one mask, applied once by the caller. A poll
+    fails on the first reason that applies, so the counts add up to the polls
+    dropped. Duplicates, the same poll inserted twice, are found by hashing
+    the identity of the otherwise valid polls. The source has no fieldwork
+    date, only the insertion date, so the identity leaves the date out and a
+    copy counts as a duplicate when inserted within DUPLICATE_WINDOW of the
+    previous one.
+    """
+    figures = df[all_party_columns]
+    total = as_float64(figures).sum(axis=1).to_numpy()
+    rejected = {
+        'missing_key_parties': df[list(KEY_PARTIES)].isna().any(axis=1).to_numpy(),
+        'total_out_of_range': ~((total > TOTAL_RANGE[0]) & (total < TOTAL_RANGE[1])),
+        'too_old': ~(df['date'] >= (now or datetime.now()) - MAX_POLL_AGE).to_numpy(),
+    }
+    keep = ~np.logical_or.reduce(list(rejected.values()))
+
+    candidates = np.flatnonzero(keep)
+    pollsters = df['Realizzatore'] if 'Realizzatore' in df.columns else pd.Series('', index=df.index)
+    hashes = poll_identity_hashes(pollsters.iloc[candidates], figures.to_numpy(dtype='float64')[candidates])
+    rejected['duplicate'] = np.zeros(len(df), dtype=bool)
+    rejected['duplicate'][candidates[duplicate_mask(hashes, df['date'].to_numpy()[candidates])]] = True
+    keep &= ~rejected['duplicate']
+
+    counts, failed = {}, np.zeros(len(df), dtype=bool)
+    for reason in REJECTION_REASONS:
+        counts[reason] = int((rejected[reason] & ~failed).sum())
+        failed |= rejected[reason]
+    return keep, {'polls': len(df), 'kept': int(keep.sum()), 'rejected': counts}
+
+def filter_polls(df, all_party_columns, now=None):
+    """The valid polls, sorted by date, and the validate_polls() rejection report"""
+    keep, report = validate_polls(df, all_party_columns, now)
+    df = df[keep]
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date', kind='stable')
+    return df, report
+
+def filter_data(df, all_party_columns, now=None):
     """Apply filters to the dataset"""
-    # Filter missing key parties
-    df = df[df['Partito Democratico'].notna() & df['Fratelli d\'Italia'].notna()]
-    
-    # Filter by total percentage
-    df = df[df[all_party_columns].sum(axis=1) > 90]
-    df = df[df[all_party_columns].sum(axis=1) < 110]
-    
-    # Filter by date
-    three_years_ago = datetime.now() - timedelta(days=3*365)
-    df = df[df['date'] >= three_years_ago]
-    
-    return df.sort_values('date')
+    return filter_polls(df, all_party_columns, now)[0]
+
+def day_numbers(dates):
+    """Days since the first date, as floats, for x-based computations"""
+    dates = pd.DatetimeIndex(dates)
+    if len(dates) == 0:
+        return np.array([], dtype='float64')
+    return np.asarray((dates - dates[0]) / pd.Timedelta(days=1), dtype='float64')
+
+def select_chart_rows(df_weighted_ma, series, max_points):
+    """Positions of the average rows to plot; every row when max_points is 0"""
+    if not max_points:
+        return np.arange(len(df_weighted_ma))
+    return shared_indices(day_numbers(date_column(df_weighted_ma)), series, max_points)
+
+def prepare_chart_datasets(df, df_weighted_ma, party_config, max_points=0):
+    """Prepare datasets for the party chart
 
-def prepare_chart_datasets(df, df_weighted_ma, dates, party_config):
-    """Prepare datasets for the party chart"""
+    Lines follow the rows of df_weighted_ma, which may already be downsampled
+    and are labelled by the caller; poll points take their dates from df and
+    are thinned to max_points per party.
+    """
     datasets = []
+    dates = date_column(df)
+    poll_dates = dates.dt.strftime('%Y-%m-%d').to_numpy()
+    poll_days = day_numbers(dates)
     
     for abbr, config in party_config.items():
         if not config['show_in_graph']:
@@ -53,7 +155,7 @@ def prepare_chart_datasets(df, df_weighted_ma, dates, party_config):
         # Line dataset (moving average)
         party_data = {
             'label': abbr,
-            'data': df_weighted_ma[f'{abbr}_MA'].round(1).tolist(),
+            'data': df_weighted_ma[f'{abbr}_MA'].to_numpy(dtype='float64').round(1).tolist(),
             'borderColor': config['color'],
             'backgroundColor': config['color'],
             'borderWidth': 1.5,
@@ -66,12 +168,14 @@ def prepare_chart_datasets(df, df_weighted_ma, dates, party_config):
         # Scatter points dataset (polls)
         scatter_data = []
         if config['name'] in df.columns:
-            for i, value in enumerate(df[config['name']]):
-                if pd.notna(value):
-                    scatter_data.append({
-                        'x': dates[i],
-                        'y': round(value, 1)
-                    })
+            values = df[config['name']].to_numpy(dtype='float64')
+            present = np.flatnonzero(~np.isnan(values))
+            if max_points:
+                present = present[thin_points(poll_days[present], values[present], max_points)]
+            scatter_data = [
+                {'x': x, 'y': round(y, 1)}
+                for x, y in zip(poll_dates[present].tolist(), values[present].tolist())
+            ]
         
         if scatter_data:
             datasets.append({
@@ -86,4 +190,4 @@ def prepare_chart_datasets(df, df_weighted_ma, dates, party_config):
         
         datasets.append(party_data)
     
-    return datasets 
\ No newline at end of file
+    return datasets
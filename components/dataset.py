@@ -0,0 +1,372 @@
+"""Loading, caching and refreshing of the processed poll dataset"""
+from dataclasses import dataclass, replace
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+from components.data_processing import load_and_preprocess_data, filter_polls, REJECTION_REASONS
+from components.poll_source import get_poll_source
+from components.shared_dataset import get_shared_store
+from components.chart_payload import build_home_summary
+from components.daily_index import DailyIndex, build_daily_index
+from components.halflives import HALFLIFE_OPTIONS, DEFAULT_HALFLIFE
+from components.og_image import render_og_image
+from components.uncertainty import bootstrap_bands, UncertaintyBands, BOOTSTRAP_REPLICATES, BAND_LEVEL
+from moving_average import (update_weighted_ma, build_smoothed_averages, combine_frames, split_frames,
+                            SmoothedAverages)
+from utils.cache_manager import TieredCache, MemoryTier
+from utils.columnar import encode_frame, decode_frame
+from utils.redis_client import get_redis_client, report_redis_error, report_redis_success
+from utils.metrics import counter, gauge, timed
+from utils.refresh import RefreshCoordinator, start_scheduler
+
+METADATA_KEY = 'polls:metadata'
+FRESH_KEY = 'polls:fresh'
+
+FRESH_TTL = 3600  # seconds before a snapshot is refreshed
+SNAPSHOT_TTL = 2 * 86400  # how long the last good snapshot is kept to serve stale
+SUPERSEDED_TTL = 120  # grace period for readers of a replaced snapshot
+COLD_START_WAIT = 60  # seconds to wait for another worker's first build
+METADATA_CACHE_TTL = 2  # seconds a worker reuses the current version before asking Redis again
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+SMOOTHING_CACHE_BYTES = 64 * 1024 * 1024
+
+@dataclass
+class Snapshot:
+    """A processed dataset and where it stands"""
+    df: pd.DataFrame
+    df_weighted_ma: pd.DataFrame
+    party_columns: set
+    version: str
+    built_at: float
+    stale: bool = False
+    rejections: dict = None  # data_processing.validate_polls() report
+
+_current = None
+_current_lock = threading.Lock()
+shared_store = get_shared_store()
+coordinator = RefreshCoordinator('polls:refresh_lock', lock_file=shared_store.lock_file if shared_store else None,
+                                 max_retry_delay=FRESH_TTL // 4)
+snapshot_loads = counter('snapshot_loads_total', "Where served snapshots came from: memory, shared file, tiered cache or a rebuild")
+rebuilds = counter('snapshot_rebuilds_total', "Dataset rebuilds by how the poll source changed")
+
+# Redis caching
+def compress_json(data):
+    return zlib.compress(json.dumps(data).encode())
+
+def decompress_json(data):
+    return json.loads(zlib.decompress(data).decode())
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+# The combined poll and average frame and per-version metadata, keyed by data version
+frame_cache = TieredCache(
+    'polls:frame', lambda df: encode_frame(df, compress=True), decode_frame,
+    memory_bytes=FRAME_CACHE_BYTES, memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL,
+    sizeof=frame_nbytes
+)
+snapshot_cache = TieredCache(
+    'polls:snapshot', compress_json, decompress_json,
+    memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL, sizeof=lambda metadata: 1024
+)
+# Averages over every HALFLIFE_OPTIONS half-life, keyed by data version
+smoothing_cache = TieredCache(
+    'polls:smoothing',
+    lambda smoothed: encode_frame(smoothed.to_frame(), compress=True),
+    lambda data: SmoothedAverages.from_frame(decode_frame(data)),
+    memory_bytes=SMOOTHING_CACHE_BYTES, memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL,
+    sizeof=lambda smoothed: smoothed.values.nbytes
+)
+# Bootstrap bands of the default average, keyed by data version
+bands_cache = TieredCache(
+    'polls:bands',
+    lambda bands: encode_frame(bands.to_frame(), compress=True),
+    lambda data: UncertaintyBands.from_frame(decode_frame(data)),
+    memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL,
+    sizeof=lambda bands: bands.lower.nbytes + bands.upper.nbytes
+)
+# Daily index of the averages, keyed by data version and half-life
+daily_cache = TieredCache(
+    'polls:daily',
+    lambda index: compress_json(index.to_json()),
+    lambda data: DailyIndex.from_json(decompress_json(data)),
+    memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL,
+    sizeof=lambda index: 64 * len(index.values) * (len(index.parties) + len(index.coalitions))
+)
+# Open Graph image of the default averages, keyed by data version
+og_image_cache = TieredCache(
+    'polls:og', lambda png: png, lambda data: data,
+    memory_ttl=SNAPSHOT_TTL, disk_ttl=SNAPSHOT_TTL, redis_ttl=SNAPSHOT_TTL
+)
+_metadata_memo = MemoryTier(max_bytes=1, ttl=METADATA_CACHE_TTL, sizeof=lambda value: 1)
+
+def compute_data_version(df_weighted_ma):
+    """Content hash identifying a processed dataset"""
+    hashed = pd.util.hash_pandas_object(df_weighted_ma, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+
+def build_snapshot():
+    """Fetch, parse, filter and average the polls"""
+    with timed('load'):
+        df, all_party_columns = load_and_preprocess_data()
+    with timed('filter'):
+        df, rejections = filter_polls(df, all_party_columns)
+    rejected = ', '.join(f"{rejections['rejected'][reason]} {reason}" for reason in REJECTION_REASONS)
+    print(f"Kept {rejections['kept']} of {rejections['polls']} polls; rejected {rejected}")
+    with timed('ewma'):
+        df_weighted_ma = update_weighted_ma(df)
+    return Snapshot(df, df_weighted_ma, set(all_party_columns), compute_data_version(df_weighted_ma), time.time(),
+                    rejections=rejections)
+
+def snapshot_metadata(snapshot):
+    return {
+        'party_columns': list(snapshot.party_columns),
+        'last_update': datetime.fromtimestamp(snapshot.built_at).isoformat(),
+        'built_at': snapshot.built_at,
+        'version': snapshot.version,
+        'rejections': snapshot.rejections,
+    }
+
+def cache_snapshot(snapshot):
+    """Write the snapshot through the memory and disk tiers; return the encoded entries for Redis"""
+    frame_key = f'dataset:{snapshot.version}'
+    frame = combine_frames(snapshot.df, snapshot.df_weighted_ma)
+    encoded = {frame_cache.key(frame_key): frame_cache.set(frame_key, frame, redis=False)}
+    metadata_key = snapshot_cache.key(snapshot.version)
+    encoded[metadata_key] = snapshot_cache.set(snapshot.version, snapshot_metadata(snapshot), redis=False)
+    return encoded
+
+def publish_snapshot(redis_client, snapshot, previous_version=None, encoded=None):
+    """Write the frames, then atomically switch metadata and freshness to them"""
+    encoded = encoded or cache_snapshot(snapshot)
+    try:
+        with timed('redis_publish'):
+            pipe = redis_client.pipeline(transaction=True)
+            for key, data in encoded.items():
+                pipe.setex(key, SNAPSHOT_TTL, data)
+            pipe.setex(METADATA_KEY, SNAPSHOT_TTL, compress_json(snapshot_metadata(snapshot)))
+            pipe.setex(FRESH_KEY, FRESH_TTL, snapshot.version)
+            if previous_version and previous_version != snapshot.version:
+                pipe.expire(frame_cache.key(f'dataset:{previous_version}'), SUPERSEDED_TTL)
+            pipe.execute()
+        report_redis_success()
+        return True
+    except Exception as e:
+        print(f"Cache write error: {e}")
+        report_redis_error(e)
+        return False
+
+def _set_current(snapshot):
+    global _current
+    with _current_lock:
+        _current = snapshot
+    return snapshot
+
+def refresh_snapshot():
+    """Rebuild the dataset and publish it; callers go through the coordinator"""
+    previous = _current
+    with timed('rebuild'):
+        snapshot = build_snapshot()
+    # Before the version is visible, so no request has to run the bootstrap or draw the image
+    get_uncertainty_bands(snapshot)
+    get_og_image(snapshot)
+    _set_current(snapshot)
+    rebuilds.inc(change=get_poll_source().last_status or 'unknown')
+    snapshot_loads.inc(source='rebuild')
+    if shared_store:
+        try:
+            with timed('shared_publish'):
+                shared_store.publish(combine_frames(snapshot.df, snapshot.df_weighted_ma), snapshot_metadata(snapshot))
+            # Serve from the mapping too, so this worker holds no private copy either
+            snapshot = _load_shared(snapshot.version) or snapshot
+        except OSError as e:
+            print(f"Shared dataset write error: {e}")
+    encoded = cache_snapshot(snapshot)
+    redis_client = get_redis_client()
+    if redis_client:
+        publish_snapshot(redis_client, snapshot, previous.version if previous else None, encoded)
+    _metadata_memo.delete('current')
+    print(f"🔄 Published poll snapshot {snapshot.version}")
+    return snapshot
+
+def _read_metadata(redis_client):
+    version, stale = None, True
+    memo = _metadata_memo.get('current') if redis_client else None
+    if memo is not None:
+        version, stale = memo
+    elif redis_client:
+        try:
+            with timed('redis'):
+                metadata, fresh = redis_client.mget(METADATA_KEY, FRESH_KEY)
+            report_redis_success()
+            if metadata:
+                version = decompress_json(metadata).get('version')
+                stale = fresh is None
+                _metadata_memo.set('current', (version, stale))
+        except Exception as e:
+            print(f"Error retrieving {METADATA_KEY}: {e}")
+            report_redis_error(e)
+    published = shared_store.current() if shared_store and version is None else None
+    if published:
+        version, stale = published['version'], time.time() - published['built_at'] > FRESH_TTL
+    current = _current
+    if version is None and current is not None:
+        version, stale = current.version, time.time() - current.built_at > FRESH_TTL
+    return version, stale
+
+def get_snapshot_metadata(redis_client=None):
+    """Return (version, stale) of the snapshot to serve, or (None, True) if there is none
+
+    A stale answer also schedules a single-flight background refresh, unless
+    the last one failed too recently (RefreshCoordinator backoff).
+    """
+    redis_client = redis_client or get_redis_client()
+    version, stale = _read_metadata(redis_client)
+    if version is not None and stale:
+        coordinator.run_in_background(refresh_snapshot)
+    return version, stale
+
+def _load_shared(version):
+    metadata = shared_store.current() if shared_store else None
+    if not metadata or metadata['version'] != version:
+        return None
+    frame = shared_store.load(version)
+    if frame is None:
+        return None
+    snapshot_loads.inc(source='shared')
+    return _set_current(Snapshot(*split_frames(frame), set(metadata['party_columns']), version, metadata['built_at'],
+                                 rejections=metadata.get('rejections')))
+
+def _load_cached(version):
+    """Read the snapshot of version through the memory, disk and Redis tiers"""
+    metadata = snapshot_cache.get(version)
+    if not metadata:
+        return None
+    with timed('cache'):
+        frame = frame_cache.get(f'dataset:{version}')
+    if frame is None:
+        return None
+    snapshot_loads.inc(source='cache')
+    return _set_current(Snapshot(*split_frames(frame), set(metadata['party_columns']), version, metadata['built_at'],
+                                 rejections=metadata.get('rejections')))
+
+def _find_snapshot(version):
+    current = _current
+    if current is not None and current.version == version:
+        snapshot_loads.inc(source='memory')
+        return current
+    snapshot = _load_shared(version) or _load_cached(version)
+    snapshot = snapshot or _current
+    return snapshot if snapshot is not None and snapshot.version == version else None
+
+def get_snapshot(redis_client=None):
+    """Return the dataset to serve, marked stale while a refresh is pending
+
+    Only a cold start, with no snapshot anywhere, waits for a build; even then
+    a single worker builds while the others wait for it to publish.
+    """
+    redis_client = redis_client or get_redis_client()
+    version, stale = get_snapshot_metadata(redis_client)
+    snapshot = _find_snapshot(version) if version else None
+    if snapshot is not None:
+        return replace(snapshot, stale=stale)
+
+    with coordinator.hold(blocking=True, wait_timeout=COLD_START_WAIT) as owner:
+        # Whoever held the lock before us may have published one meanwhile
+        version, _ = _read_metadata(redis_client)
+        snapshot = _find_snapshot(version) if version else None
+        if snapshot is not None:
+            return snapshot
+        if not owner:
+            print("Timed out waiting for the poll snapshot, building it here")
+        return refresh_snapshot()
+
+def get_smoothed_averages(snapshot):
+    """Every HALFLIFE_OPTIONS average of the snapshot, computed once per data version"""
+    def build():
+        with timed('smoothing'):
+            return build_smoothed_averages(snapshot.df)
+    return smoothing_cache.get(f"{snapshot.version}:{','.join(map(str, HALFLIFE_OPTIONS))}", build)
+
+def get_uncertainty_bands(snapshot):
+    """Bootstrap bands of the snapshot's average, computed once per data version at refresh"""
+    def build():
+        with timed('bootstrap'):
+            # Seeded by the version, so every worker that has to rebuild them agrees
+            return bootstrap_bands(snapshot.df, snapshot.df_weighted_ma, seed=int(snapshot.version, 16))
+    return bands_cache.get(f"{snapshot.version}:{BOOTSTRAP_REPLICATES}:{BAND_LEVEL}", build)
+
+def with_halflife(snapshot, halflife):
+    """The snapshot with its `_MA` columns averaged over halflife days"""
+    if halflife == DEFAULT_HALFLIFE:
+        return snapshot
+    df_weighted_ma = get_smoothed_averages(snapshot).apply(snapshot.df_weighted_ma, halflife)
+    return replace(snapshot, df_weighted_ma=df_weighted_ma)
+
+def get_daily_index(snapshot, halflife=DEFAULT_HALFLIFE):
+    """The daily index of the snapshot's averages over halflife days, built once per data version"""
+    def build():
+        with timed('daily_index'):
+            return build_daily_index(with_halflife(snapshot, halflife).df_weighted_ma)
+    return daily_cache.get(f"{snapshot.version}:{halflife}", build)
+
+def get_og_image(snapshot):
+    """PNG preview of the snapshot's latest averages, rendered once per data version at refresh"""
+    def build():
+        with timed('og_image'):
+            return render_og_image(build_home_summary(snapshot.df_weighted_ma), get_daily_index(snapshot))
+    return og_image_cache.get(snapshot.version, build)
+
+def cached_og_image(version):
+    """The preview already rendered for version, or None; never renders it"""
+    return og_image_cache.get(version)
+
+def rejection_report():
+    """What validation dropped from the snapshot this worker serves, or None before it has one"""
+    current = _current
+    return current.rejections if current is not None else None
+
+def _rejected_by_reason():
+    report = rejection_report()
+    return {(('reason', reason),): count for reason, count in report['rejected'].items()} if report else {}
+
+gauge('polls_rejected', "Polls of the served snapshot dropped by validation, by reason", _rejected_by_reason)
+
+def cache_stats():
+    """Per-tier hit ratios of the snapshot caches"""
+    return {
+        'frames': frame_cache.stats_dict(),
+        'snapshots': snapshot_cache.stats_dict(),
+        'smoothing': smoothing_cache.stats_dict(),
+        'bands': bands_cache.stats_dict(),
+        'daily': daily_cache.stats_dict(),
+        'og_image': og_image_cache.stats_dict(),
+    }
+
+def start_background_refresh(interval=None):
+    """Refresh ahead of expiry every interval seconds (POLLS_REFRESH_INTERVAL)"""
+    interval = interval or int(os.environ.get('POLLS_REFRESH_INTERVAL', 0))
+    if interval <= 0:
+        return None
+
+    def refresh_if_due():
+        redis_client = get_redis_client()
+        remaining = None
+        if redis_client:
+            try:
+                remaining = redis_client.ttl(FRESH_KEY)
+            except Exception as e:
+                report_redis_error(e)
+        elif _current is not None:
+            remaining = FRESH_TTL - (time.time() - _current.built_at)
+        if remaining is None or remaining < 2 * interval:
+            coordinator.run(refresh_snapshot)
+
+    return start_scheduler(interval, refresh_if_due, name='poll-refresh')
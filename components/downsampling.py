@@ -0,0 +1,66 @@
+"""Downsampling of chart series to a point budget"""
+import numpy as np
+
+def _bucket_means(values, starts):
+    """Mean of every bucket of rows beginning at starts, ignoring NaN (NaN for an all-NaN bucket)"""
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0), starts)
+    counts = np.add.reduceat(present, starts)
+    with np.errstate(invalid='ignore'):
+        return sums / counts
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of the threshold points that best keep the shape
+
+    y is one series, or a 2-D array with a column per series that then share
+    the picked points: a point's triangle area is summed over the series, a
+    NaN value adding nothing. Each triangle is anchored on the averages of the
+    buckets either side instead of the previous pick, so every bucket is
+    solved at once.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64').reshape(len(x), -1)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket edges for the n - 2 inner points; first and last are always kept
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    inner = slice(1, n - 1)
+    starts = edges[:-1] - 1
+    mean_x = np.add.reduceat(x[inner], starts) / np.diff(edges)
+    mean_y = _bucket_means(y[inner], starts)
+    previous_x, next_x = np.r_[x[0], mean_x[:-1]], np.r_[mean_x[1:], x[-1]]
+    previous_y, next_y = np.vstack([y[:1], mean_y[:-1]]), np.vstack([mean_y[1:], y[-1:]])
+
+    bucket = np.repeat(np.arange(threshold - 2), np.diff(edges))
+    px, py = previous_x[bucket], previous_y[bucket]
+    area = np.nansum(np.abs(
+        (px - next_x[bucket])[:, None] * (y[inner] - py)
+        - (px - x[inner])[:, None] * (next_y[bucket] - py)
+    ), axis=1)
+    # Sorted by bucket, then area, then position descending: the last of each bucket is its first largest
+    order = np.lexsort((-np.arange(n - 2), area, bucket))
+    return np.r_[0, order[edges[1:] - 2] + 1, n - 1]
+
+def shared_indices(x, series, threshold):
+    """At most threshold rows picked by LTTB over every series at once, so they share one label axis"""
+    x = np.asarray(x, dtype='float64')
+    if not len(x):
+        return np.arange(0)
+    values = np.column_stack([np.asarray(values, dtype='float64') for values in series] or [np.zeros(len(x))])
+    return lttb_indices(x, values, threshold)
+
+def thin_points(x, y, threshold):
+    """Bucketed thinning for scatter points: the median-valued point of each time bucket"""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n or threshold <= 0:
+        return np.arange(n)
+    buckets = np.minimum(((x - x[0]) / max(x[-1] - x[0], 1e-9) * threshold).astype(int), threshold - 1)
+    # Sorting by (bucket, value) puts every bucket's median in the middle of its run
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, np.diff(buckets[order]) != 0])
+    ends = np.r_[starts[1:], n]
+    return np.sort(order[(starts + ends - 1) // 2])
@@ -0,0 +1,22 @@
+"""Smoothing windows readers can choose between
+
+Kept apart from moving_average so that serving a precomputed artifact does
+not need pandas.
+"""
+# Half-lives, in days, of the averages offered on the home page and the API
+HALFLIFE_OPTIONS = (7, 14, 30, 60)
+DEFAULT_HALFLIFE = 14
+
+def parse_halflife(value):
+    """Return the half-life in days for a ?halflife= value, or None if it is not one of HALFLIFE_OPTIONS"""
+    if value is None or value == '':
+        return DEFAULT_HALFLIFE
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return None
+    return days if days in HALFLIFE_OPTIONS else None
+
+def normalize_halflife(value):
+    """Like parse_halflife, falling back to DEFAULT_HALFLIFE"""
+    return parse_halflife(value) or DEFAULT_HALFLIFE
@@ -0,0 +1,117 @@
+"""Open Graph preview image with the latest averages and a sparkline
+
+Drawn with Pillow from the home page summary and the daily index, so it needs
+neither pandas nor NumPy and can be rendered by scripts/precompute.py as well
+as at every refresh. Text uses the first font found in FONT_PATHS, else the
+font bundled with Pillow. Without Pillow there is no image and pages point to
+the static og-image.png instead.
+"""
+from functools import lru_cache
+import io
+
+from config.party_config import PARTY_CONFIG
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow is optional, pages fall back to static/og-image.png
+    Image = None
+
+WIDTH, HEIGHT = 1200, 630  # recommended OG image size
+SCALE = 2  # drawn at twice the size and downsampled, to smooth lines and text
+SPARKLINE_DAYS = 365
+SPARKLINE_POINTS = 180  # at most about one point every 3 pixels
+BACKGROUND = '#ffffff'
+TEXT_COLOR = '#1a1a1a'
+MUTED_COLOR = '#666666'
+GRID_COLOR = '#e5e5e5'
+
+FONT_PATHS = {
+    'bold': (
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+        '/System/Library/Fonts/Supplemental/Arial Bold.ttf',
+        'arialbd.ttf',
+    ),
+    'regular': (
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+        '/System/Library/Fonts/Supplemental/Arial.ttf',
+        'arial.ttf',
+    ),
+}
+
+def available():
+    return Image is not None
+
+@lru_cache(maxsize=None)
+def load_font(weight, size):
+    """The first of FONT_PATHS[weight] that loads, else Pillow's bundled font"""
+    for path in FONT_PATHS[weight]:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+def sparkline_series(index, parties, days=SPARKLINE_DAYS):
+    """The last days of every party's average in the daily index, one list per party"""
+    if index is None or not index.values:
+        return {}
+    rows = index.values[-days:]
+    rows = rows[::max(len(rows) // SPARKLINE_POINTS, 1)] + ([rows[-1]] if len(rows) > SPARKLINE_POINTS else [])
+    columns = {abbr: i for i, abbr in enumerate(index.parties)}
+    return {abbr: [row[columns[abbr]] for row in rows] for abbr in parties if abbr in columns}
+
+def draw_sparkline(draw, series, box, width, party_config=PARTY_CONFIG):
+    left, top, right, bottom = box
+    values = [value for points in series.values() for value in points if value is not None]
+    if not values:
+        return
+    low, high = min(values), max(values)
+    padding = max((high - low) * 0.05, 0.5)
+    low, high = low - padding, high + padding
+    for fraction in (0.25, 0.5, 0.75):
+        y = top + (bottom - top) * fraction
+        draw.line([(left, y), (right, y)], fill=GRID_COLOR, width=max(width // 3, 1))
+    for abbr, points in series.items():
+        step = (right - left) / max(len(points) - 1, 1)
+        line = [
+            (left + i * step, bottom - (value - low) / (high - low) * (bottom - top))
+            for i, value in enumerate(points) if value is not None
+        ]
+        if len(line) > 1:
+            draw.line(line, fill=party_config[abbr]['color'], width=width, joint='curve')
+
+def render_og_image(summary, index=None, party_config=PARTY_CONFIG):
+    """PNG bytes of the preview image for a build_home_summary() and DailyIndex, or None without Pillow"""
+    if not available():
+        return None
+    s = SCALE
+    image = Image.new('RGB', (WIDTH * s, HEIGHT * s), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    draw.text((60 * s, 48 * s), "Sondaggi Nazionali", font=load_font('bold', 60 * s), fill=TEXT_COLOR)
+    draw.text((60 * s, 128 * s), f"Media dei sondaggi al {summary['latest_date']}",
+              font=load_font('regular', 30 * s), fill=MUTED_COLOR)
+
+    shown = [abbr for abbr, config in party_config.items()
+             if config['show_in_graph'] and summary['parties'].get(abbr) is not None]
+    shown.sort(key=lambda abbr: summary['parties'][abbr], reverse=True)
+    name_font, value_font = load_font('bold', 38 * s), load_font('regular', 38 * s)
+    for row, abbr in enumerate(shown):
+        y = (200 + row * 62) * s
+        draw.rounded_rectangle([60 * s, y + 6 * s, 88 * s, y + 34 * s], radius=5 * s, fill=party_config[abbr]['color'])
+        draw.text((108 * s, y), abbr, font=name_font, fill=TEXT_COLOR)
+        draw.text((540 * s, y), f"{summary['parties'][abbr]:.1f}%", font=value_font, fill=TEXT_COLOR, anchor='ra')
+
+    draw_sparkline(draw, sparkline_series(index, shown), (620 * s, 210 * s, 1140 * s, 540 * s), 5 * s,
+                   party_config)
+    small = load_font('regular', 24 * s)
+    draw.text((620 * s, 560 * s), "Ultimi 12 mesi", font=small, fill=MUTED_COLOR)
+    draw.text((60 * s, 560 * s), "sondagginazionali.it", font=small, fill=MUTED_COLOR)
+
+    if s != 1:
+        image = image.reduce(s)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=6)
+    return buffer.getvalue()
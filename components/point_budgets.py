@@ -0,0 +1,23 @@
+"""Point budgets the charts can be downsampled to
+
+Kept apart from components.downsampling so that serving a precomputed
+artifact does not need NumPy.
+"""
+# Budgets a client may ask for; requests are rounded up to one of these, and
+# capped at the largest, so the number of cached variants stays small. 0 means
+# no downsampling.
+POINT_BUDGETS = (150, 300, 600, 1200)
+DEFAULT_POINT_BUDGET = 600
+
+def normalize_point_budget(value):
+    """Map a requested ?points= value onto POINT_BUDGETS (0 keeps every point)
+
+    Values above the largest budget get the largest, not the full series.
+    """
+    try:
+        requested = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_POINT_BUDGET
+    if requested <= 0:
+        return 0
+    return next((budget for budget in POINT_BUDGETS if budget >= requested), POINT_BUDGETS[-1])
@@ -0,0 +1,175 @@
+"""Pluggable sources for the raw poll CSV with conditional, incremental loading"""
+from dataclasses import dataclass, asdict
+from email.utils import formatdate
+from typing import Optional
+import hashlib
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from components.schema import compact_metadata
+from utils.cache_manager import CACHE_DIR
+from utils.metrics import timed
+
+POLLS_CSV_URL = 'https://raw.githubusercontent.com/ruggsea/llm_italian_poll_scraper/main/italian_polls.csv'
+POLLS_FILENAME = 'italian_polls.csv'
+STATE_FILE = os.path.join(CACHE_DIR, 'poll_source.json')
+CONTENT_FILE = os.path.join(CACHE_DIR, 'poll_source.csv')
+HTTP_TIMEOUT = 30
+
+@dataclass
+class SourceState:
+    """Validators of the last content we parsed"""
+    location: str = ''
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    size: int = 0
+
+class PollSource:
+    """Base class: subclasses fetch raw bytes, this class decides what to re-parse
+
+    After load(), last_status is 'unchanged' (nothing parsed), 'appended' (only
+    the new rows were parsed) or 'replaced' (the whole file was parsed).
+    """
+    keep_copy = False
+
+    def __init__(self, location, state_file=STATE_FILE, content_file=CONTENT_FILE):
+        self.location = location
+        self.state_file = state_file
+        self.content_file = content_file
+        self.state = self._read_state()
+        self.last_status = None
+        self._content = self._read_copy()
+        self._parsed = None
+        self._lock = threading.Lock()
+
+    def fetch(self, state):
+        """Return (content, new validators), or (None, None) when unchanged since state"""
+        raise NotImplementedError
+
+    def load(self, preprocess):
+        """Return (df, all_party_columns) parsed with preprocess, reusing earlier work"""
+        with self._lock:
+            return self._load(preprocess)
+
+    def _load(self, preprocess):
+        known = self.state if self._content is not None else SourceState(self.location)
+        with timed('csv_fetch'):
+            content, validators = self.fetch(known)
+        if content is None:
+            if self._parsed is None:
+                # Upstream matches the copy kept from a previous process
+                self._parsed = preprocess(pd.read_csv(io.BytesIO(self._content)))
+                self.last_status = 'replaced'
+            else:
+                self.last_status = 'unchanged'
+            return self._parsed
+
+        content_hash = hashlib.sha256(content).hexdigest()
+        if self._parsed is not None and content_hash == self.state.content_hash:
+            self.last_status = 'unchanged'
+        elif self._parsed is not None and self._only_grew(content):
+            header = self._content[:self._content.index(b'\n') + 1]
+            new_rows, _ = preprocess(pd.read_csv(io.BytesIO(header + content[len(self._content):])))
+            df, all_party_columns = self._parsed
+            # Categories of the new rows differ, so concat falls back to strings until they are merged
+            self._parsed = compact_metadata(pd.concat([df, new_rows], ignore_index=True)), all_party_columns
+            self.last_status = 'appended'
+        else:
+            self._parsed = preprocess(pd.read_csv(io.BytesIO(content)))
+            self.last_status = 'replaced'
+
+        self._content = content
+        self.state = SourceState(self.location, content_hash=content_hash, size=len(content), **validators)
+        self._save(content)
+        return self._parsed
+
+    def _only_grew(self, content):
+        old = self._content
+        return (
+            old is not None and len(content) > len(old) and old.endswith(b'\n')
+            and b'\n' in old and content[:len(old)] == old
+        )
+
+    def _read_state(self):
+        try:
+            with open(self.state_file) as f:
+                state = SourceState(**json.load(f))
+            return state if state.location == self.location else SourceState(self.location)
+        except (OSError, ValueError, TypeError):
+            return SourceState(self.location)
+
+    def _read_copy(self):
+        if not self.keep_copy or not self.state.content_hash:
+            return None
+        try:
+            with open(self.content_file, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        return content if hashlib.sha256(content).hexdigest() == self.state.content_hash else None
+
+    def _save(self, content):
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            if self.keep_copy:
+                with open(self.content_file, 'wb') as f:
+                    f.write(content)
+            with open(self.state_file, 'w') as f:
+                json.dump(asdict(self.state), f)
+        except OSError as e:
+            print(f"Could not save poll source state: {e}")
+
+class HttpPollSource(PollSource):
+    """Remote CSV fetched with If-None-Match / If-Modified-Since"""
+    keep_copy = True
+
+    def fetch(self, state):
+        request = urllib.request.Request(self.location)
+        if state.etag:
+            request.add_header('If-None-Match', state.etag)
+        if state.last_modified:
+            request.add_header('If-Modified-Since', state.last_modified)
+        try:
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                content = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, None
+            raise
+        return content, {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+class LocalPollSource(PollSource):
+    """CSV on the local filesystem; a directory means its italian_polls.csv"""
+    def __init__(self, location, state_file=STATE_FILE, content_file=CONTENT_FILE):
+        if os.path.isdir(location):
+            location = os.path.join(location, POLLS_FILENAME)
+        super().__init__(location, state_file, content_file)
+
+    def fetch(self, state):
+        stat = os.stat(self.location)
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if state.etag == etag:
+            return None, None
+        with open(self.location, 'rb') as f:
+            return f.read(), {'etag': etag, 'last_modified': last_modified}
+
+_sources = {}
+
+def get_poll_source(location=None):
+    """Return the (cached) source for location, POLLS_SOURCE or the GitHub CSV"""
+    location = location or os.environ.get('POLLS_SOURCE') or POLLS_CSV_URL
+    if location not in _sources:
+        if location.startswith(('http://', 'https://')):
+            _sources[location] = HttpPollSource(location)
+        else:
+            _sources[location] = LocalPollSource(location)
+    return _sources[location]
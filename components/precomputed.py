@@ -0,0 +1,91 @@
+"""Ready-to-serve artifact written at build time by scripts/precompute.py
+
+The artifact holds everything the default pages and API responses need: the
+figures listed on the home page, the chart payload for every point budget and
+the unfiltered API bodies, the daily index of averages and the og:image PNG. Serving from it needs neither pandas nor NumPy;
+those are only imported if a request falls outside what was precomputed or the
+artifact is older than PRECOMPUTED_MAX_AGE seconds.
+"""
+from dataclasses import dataclass, field
+import gzip
+import json
+import os
+import threading
+import time
+
+ARTIFACT_FORMAT = 1
+
+@dataclass
+class Artifact:
+    """A precomputed dataset version"""
+    version: str
+    built_at: float
+    summary: dict
+    charts: dict = field(default_factory=dict)  # point budget -> chart payload
+    api: dict = field(default_factory=dict)  # endpoint name -> unfiltered JSON body
+    daily: dict = None  # DailyIndex.to_json()
+    og_image: str = None  # base64 PNG from components.og_image
+
+    def to_json(self):
+        return {
+            'format': ARTIFACT_FORMAT,
+            'version': self.version,
+            'built_at': self.built_at,
+            'summary': self.summary,
+            'charts': {str(budget): payload for budget, payload in self.charts.items()},
+            'api': self.api,
+            'daily': self.daily,
+            'og_image': self.og_image,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported artifact format {data.get('format')!r}")
+        return cls(
+            version=data['version'],
+            built_at=data['built_at'],
+            summary=data['summary'],
+            charts={int(budget): payload for budget, payload in data['charts'].items()},
+            api=data['api'],
+            daily=data.get('daily'),
+            og_image=data.get('og_image'),
+        )
+
+def write_artifact(artifact, path):
+    """Write artifact as gzipped JSON, replacing path atomically"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    staging = f'{path}.tmp'
+    with gzip.open(staging, 'wt', encoding='utf-8') as f:
+        json.dump(artifact.to_json(), f, separators=(',', ':'))
+    os.replace(staging, path)
+
+def read_artifact(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return Artifact.from_json(json.load(f))
+
+_loaded = (None, None)  # (path and mtime, artifact)
+_lock = threading.Lock()
+
+def get_artifact(path=None, max_age=None):
+    """Return the artifact at PRECOMPUTED_ARTIFACT, or None if unset, unreadable or too old"""
+    global _loaded
+    path = path or os.environ.get('PRECOMPUTED_ARTIFACT')
+    if not path:
+        return None
+    max_age = max_age if max_age is not None else int(os.environ.get('PRECOMPUTED_MAX_AGE', 0))
+    try:
+        signature = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    with _lock:
+        if _loaded[0] != signature:
+            try:
+                _loaded = (signature, read_artifact(path))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not read precomputed artifact {path}: {e}")
+                _loaded = (signature, None)
+        artifact = _loaded[1]
+    if artifact is not None and max_age > 0 and time.time() - artifact.built_at > max_age:
+        return None
+    return artifact
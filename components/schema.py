@@ -0,0 +1,52 @@
+"""Column types of the processed poll dataset
+
+Party shares and their `_MA` averages are float32: the figures have one or two
+decimals and float32 keeps seven significant digits, so a share widens back to
+float64 with as_float64() before it is summed or written to JSON. Pollster,
+client and insertion date repeat a handful of values and are categorical.
+
+The averages live in the same frame as the polls: a snapshot's raw and
+averaged frames are views over one combined frame (combine_frames and
+split_frames in moving_average.py), which is the only one cached and shared
+between workers. utils.columnar stores dates as int32 day numbers and a
+decoded frame keeps them that way, as a view over the cached or mapped
+buffer; date_column() widens them to datetime64 where they are used. A
+freshly parsed frame has datetime64 dates, which date_column() returns as is.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.columnar import DAY_DTYPE, NAT_DAY
+
+PARTY_DTYPE = 'float32'
+METADATA_COLUMNS = ('Data Inserimento', 'Realizzatore', 'Committente')
+# float32 holds every share below 100 to within 1e-5, so 4 decimals round back exactly
+SHARE_DECIMALS = 4
+
+def compact_metadata(df):
+    """df with its METADATA_COLUMNS categorical"""
+    columns = {
+        column: df[column].astype('category') for column in METADATA_COLUMNS
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype)
+    }
+    return df.assign(**columns) if columns else df
+
+def as_float64(values):
+    """float64 copy of float32 shares, rounded back to the decimals they were parsed from"""
+    if isinstance(values, (pd.Series, pd.DataFrame)):
+        return values.astype('float64').round(SHARE_DECIMALS)
+    return np.round(np.asarray(values, dtype='float64'), SHARE_DECIMALS)
+
+def days_to_datetime(days):
+    """datetime64 array of int32 day numbers"""
+    days = np.asarray(days)
+    values = days.astype('int64').view('datetime64[D]').astype('datetime64[s]')
+    values[days == NAT_DAY] = np.datetime64('NaT')
+    return values
+
+def date_column(df):
+    """df['date'] as datetime64, widening the day numbers of a decoded frame"""
+    dates = df['date']
+    if dates.dtype == DAY_DTYPE:
+        return pd.Series(days_to_datetime(dates.to_numpy()), index=dates.index, name='date')
+    return dates
@@ -0,0 +1,119 @@
+"""Processed dataset shared by the workers of a box through memory-mapped files
+
+The refresher writes every version to its own directory as an uncompressed
+columnar file, then switches the CURRENT pointer to it with an atomic rename.
+The file holds the polls and their averages in one frame. Workers map it
+read-only, so numeric columns are views over the page cache that all
+processes share rather than per-worker copies.
+Enabled by setting POLLS_SHARED_DIR (ideally on tmpfs, e.g. /dev/shm/sondaggi).
+"""
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+
+from utils.columnar import encode_frame, decode_frame
+
+POINTER_FILE = 'CURRENT'
+LOCK_FILE = 'refresh.lock'
+DATASET_FILE = 'dataset.sncf'
+KEEP_VERSIONS = 2  # the current version and the one readers may still be switching from
+
+class SharedDatasetStore:
+    """Versioned dataset files under directory, switched atomically"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock_file = os.path.join(directory, LOCK_FILE)
+        self._lock = threading.Lock()
+        self._pointer = (None, None)  # (stat signature, parsed pointer)
+        self._mapped = None  # (version, frame)
+        os.makedirs(directory, exist_ok=True)
+
+    def _version_dir(self, version):
+        return os.path.join(self.directory, version)
+
+    def publish(self, frame, metadata):
+        """Write the frame of metadata['version'] and make it the current version"""
+        version = metadata['version']
+        target = self._version_dir(version)
+        if not os.path.isdir(target):
+            staging = tempfile.mkdtemp(prefix=f'.{version}-', dir=self.directory)
+            with open(os.path.join(staging, DATASET_FILE), 'wb') as f:
+                f.write(encode_frame(frame))
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another refresher published the same version first
+                shutil.rmtree(staging, ignore_errors=True)
+
+        fd, pointer = tempfile.mkstemp(prefix='.pointer-', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(pointer, os.path.join(self.directory, POINTER_FILE))
+        self._prune(version)
+
+    def _prune(self, current):
+        versions = [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_dir() and entry.name != current and not entry.name.startswith('.')
+        ]
+        versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        # Unlinking is safe for workers that still map the files; the pages go with the last mapping
+        for entry in versions[KEEP_VERSIONS - 1:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def current(self):
+        """Return the metadata of the current version, or None if nothing is published"""
+        path = os.path.join(self.directory, POINTER_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._pointer[0] == signature:
+                return self._pointer[1]
+        try:
+            with open(path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read shared dataset pointer: {e}")
+            return None
+        with self._lock:
+            self._pointer = (signature, metadata)
+        return metadata
+
+    def load(self, version):
+        """Return the frame of version mapped read-only, or None if it is gone"""
+        with self._lock:
+            if self._mapped is not None and self._mapped[0] == version:
+                return self._mapped[1]
+        try:
+            frame = decode_frame(_map_file(os.path.join(self._version_dir(version), DATASET_FILE)))
+        except (OSError, ValueError) as e:
+            print(f"Could not map shared dataset {version}: {e}")
+            return None
+        with self._lock:
+            self._mapped = (version, frame)
+        return frame
+
+def _map_file(path):
+    with open(path, 'rb') as f:
+        # The mapping outlives the file object and stays valid after the file is unlinked
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_shared_store(directory=None):
+    """Return the store for POLLS_SHARED_DIR, or None when sharing is not enabled"""
+    global _store
+    directory = directory or os.environ.get('POLLS_SHARED_DIR')
+    if not directory:
+        return None
+    with _store_lock:
+        if _store is None or _store.directory != directory:
+            _store = SharedDatasetStore(directory)
+        return _store
@@ -0,0 +1,119 @@
+"""Bootstrap confidence bands around the weighted poll average
+
+Each replicate puts back, at every poll, the average plus a residual (poll
+minus average) drawn with replacement from the same party's residuals, and
+averages the result again. The EWMA at a row is sum(poll * weight) /
+sum(weight) over the polls so far, with weights that depend only on the
+dates. So the weights are computed once, each replicate only re-sums its
+resampled polls per day, and a cumulative sum over days gives the average at
+the end of every day for a whole chunk of replicates at a time. Bands are
+kept for the last row of each day, the row the charts plot.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from components.schema import date_column
+from moving_average import HALFLIFE, PARTY_MAPPING
+
+BOOTSTRAP_REPLICATES = 200
+BAND_LEVEL = 0.9
+# Resampled polls (replicates × polls of a party) held at once
+CHUNK_ELEMENTS = 1 << 22
+
+@dataclass
+class UncertaintyBands:
+    """Lower and upper band of every party at the last row of each day"""
+    parties: list  # abbreviations
+    rows: np.ndarray  # positions in df_weighted_ma
+    lower: np.ndarray  # (party × day)
+    upper: np.ndarray
+
+    def at(self, rows):
+        """(lower, upper) of each party at the given df_weighted_ma positions"""
+        days = np.searchsorted(self.rows, rows)
+        return self.lower[:, days], self.upper[:, days]
+
+    def to_frame(self):
+        """A 'row' column plus `<party>_LO` and `<party>_HI` columns, for utils.columnar"""
+        return pd.DataFrame({
+            'row': self.rows,
+            **{f'{abbr}_LO': self.lower[j] for j, abbr in enumerate(self.parties)},
+            **{f'{abbr}_HI': self.upper[j] for j, abbr in enumerate(self.parties)},
+        })
+
+    @classmethod
+    def from_frame(cls, frame):
+        parties = [column[:-3] for column in frame.columns if column.endswith('_LO')]
+        return cls(
+            parties,
+            frame['row'].to_numpy(dtype='int64'),
+            frame[[f'{abbr}_LO' for abbr in parties]].to_numpy(dtype='float64').T,
+            frame[[f'{abbr}_HI' for abbr in parties]].to_numpy(dtype='float64').T,
+        )
+
+def day_end_rows(dates):
+    """Positions of the last row of each day in a date-sorted column"""
+    days = np.asarray(pd.DatetimeIndex(dates).normalize())
+    return np.flatnonzero(np.r_[days[1:] != days[:-1], True]) if len(days) else np.array([], dtype='int64')
+
+def bootstrap_bands(df, df_weighted_ma, replicates=BOOTSTRAP_REPLICATES, level=BAND_LEVEL,
+                    halflife=HALFLIFE, seed=0):
+    """Central level-bands of the average from replicates residual-bootstrap replicates"""
+    parties = [party for party in PARTY_MAPPING if party in df.columns]
+    abbrs = [PARTY_MAPPING[party] for party in parties]
+    dates = date_column(df)
+    rows = day_end_rows(dates)
+    # Weights relative to the last poll, so they stay finite; they cancel out of every average
+    times = pd.DatetimeIndex(dates)
+    weights = np.exp2(np.asarray((times - times[-1]) / halflife, dtype='float64')) if len(times) else np.array([])
+    rng = np.random.default_rng(seed)
+
+    samples = np.full((replicates, len(parties), len(rows)), np.nan)
+    for j, (party, abbr) in enumerate(zip(parties, abbrs)):
+        values = df[party].to_numpy(dtype='float64')
+        observed = np.flatnonzero(~np.isnan(values))
+        if len(observed) == 0:
+            continue
+        average = df_weighted_ma[f'{abbr}_MA'].to_numpy(dtype='float64')[observed]
+        residuals = values[observed] - average
+        weight = weights[observed]
+
+        # Polls grouped by the day they fall in; days before the first poll stay NaN
+        day_of_poll = np.searchsorted(rows, observed)
+        poll_days, group_starts = np.unique(day_of_poll, return_index=True)
+        last_group = np.searchsorted(poll_days, np.arange(len(rows)), side='right') - 1
+        has_polls = last_group >= 0
+        mass = np.cumsum(np.add.reduceat(weight, group_starts))[last_group[has_polls]]
+        base = np.add.reduceat(average * weight, group_starts)
+
+        chunk = max(1, CHUNK_ELEMENTS // len(observed))
+        for start in range(0, replicates, chunk):
+            n = min(chunk, replicates - start)
+            drawn = residuals[rng.integers(0, len(residuals), size=(len(observed), n))]
+            drawn *= weight[:, None]
+            weighted = np.cumsum(base[:, None] + np.add.reduceat(drawn, group_starts, axis=0), axis=0)
+            samples[start:start + n, j, has_polls] = (weighted[last_group[has_polls]] / mass[:, None]).T
+
+    tail = (1 - level) / 2
+    lower, upper = np.quantile(samples, [tail, 1 - tail], axis=0)
+    return UncertaintyBands(abbrs, rows, lower, upper)
+
+def prepare_band_datasets(bands, rows, abbr, color):
+    """Lower and upper band line datasets of one party at chart rows; the upper one fills down to the lower"""
+    if abbr not in bands.parties:
+        return []
+    lower, upper = (values[bands.parties.index(abbr)] for values in bands.at(rows))
+    style = {
+        'borderColor': 'transparent',
+        'backgroundColor': color + '20',
+        'borderWidth': 0,
+        'tension': 0.4,
+        'order': 3,
+        'pointRadius': 0
+    }
+    return [
+        {'label': f'{abbr} (band)', 'data': lower.round(1).tolist(), 'fill': False, **style},
+        {'label': f'{abbr} (band)', 'data': upper.round(1).tolist(), 'fill': '-1', **style},
+    ]
@@ -1,155 +1,201 @@
 from fasthtml.common import *
-import pandas as pd
-from moving_average import calculate_weighted_ma
-import json
 import os
 import uuid
-from fasthtml.common import Response
 from fasthtml.common import Head
 from utils.logger import log_visit
-import redis
+from utils.redis_client import get_redis_client
+from utils.metrics import TimingMiddleware, timed
 import time
-from datetime import datetime, timedelta
-import zlib
+from datetime import date, datetime, timedelta
 
 # Import configurations and components
-from config.party_config import PARTY_CONFIG, COALITION_CONFIG
-from components.data_processing import (
-    load_and_preprocess_data,
-    filter_data,
-    prepare_chart_datasets
-)
+from config.party_config import PARTY_CONFIG
+from components.point_budgets import normalize_point_budget, DEFAULT_POINT_BUDGET
+from components.halflives import normalize_halflife, HALFLIFE_OPTIONS, DEFAULT_HALFLIFE
+from components.precomputed import get_artifact
+from components.daily_index import DailyIndex
 from components.charts import create_chart_scripts
+from utils.cache_manager import MemoryTier
+from utils.page_cache import get_page, get_or_render, page_response
 from routes.about import register_about_routes
 from routes.forecasting import register_forecasting_routes
+from routes.health import register_health_routes
+from routes.api import register_api_routes
+from routes.metrics import register_metrics_routes
+from routes.og_image import register_og_image_routes, og_image_url, current_version
+from routes.snapshot import register_snapshot_routes
+from routes.stats import register_stats_routes
+from routes.static import register_static_routes, move_catch_all_static_last
+from utils.assets import asset_url, get_registry
 
 # Initialize app with static file support
-app, rt = fast_app(secret_key=os.environ.get("SECRET_KEY", str(uuid.uuid4())))
+app, rt = fast_app(
+    secret_key=os.environ.get("SECRET_KEY", str(uuid.uuid4())),
+    middleware=[Middleware(TimingMiddleware)]
+)
 register_about_routes(rt)
 register_forecasting_routes(rt)
+register_health_routes(rt)
+register_api_routes(rt)
+register_metrics_routes(rt)
+register_og_image_routes(rt)
+register_snapshot_routes(rt)
+register_stats_routes(rt)
+register_static_routes(rt)
+# Load the static files now, so missing vendored assets stop the app from starting
+get_registry()
 
-# Redis caching
-def get_redis_connection():
-    redis_url = os.environ.get('REDIS_URL')
-    if not redis_url:
-        return None
+# pandas and the data pipeline are only imported when there is no precomputed artifact
+if get_artifact() is None:
+    from components.dataset import start_background_refresh
+    start_background_refresh()
+
+def parse_selected_date(value):
+    """The ?date= of the home page, or None for the latest averages"""
     try:
-        if redis_url.startswith('redis://'):
-            redis_url = redis_url.replace('redis://', 'rediss://', 1)
-        return redis.from_url(redis_url, decode_responses=False)
-    except Exception as e:
-        print(f"Redis connection error: {e}")
+        return date.fromisoformat(value) if value else None
+    except ValueError:
         return None
 
-def compress_json(data):
-    return zlib.compress(json.dumps(data).encode())
-
-def decompress_json(data):
-    return json.loads(zlib.decompress(data).decode())
+def clamp_selected_date(index, selected_date):
+    """selected_date as the day whose averages it shows, so equivalent dates share one page
 
-def store_in_redis(redis_client, key, data, expiry=3600):
-    try:
-        compressed = compress_json(data)
-        redis_client.setex(key, expiry, compressed)
-        return True
-    except Exception as e:
-        print(f"Error storing {key}: {e}")
-        return False
-
-def get_from_redis(redis_client, key):
-    try:
-        data = redis_client.get(key)
-        if data:
-            return decompress_json(data)
-        return None
-    except Exception as e:
-        print(f"Error retrieving {key}: {e}")
+    Dates after the last poll show the last day's averages; every date before
+    the first poll becomes the day before it, which has none.
+    """
+    if selected_date is None or index is None or not index.values:
         return None
+    offset = index.offset(selected_date)
+    if offset is None:
+        return index.first_date - timedelta(days=1)
+    return date.fromordinal(index.first_day + offset)
+
+# Chart scripts of the home page by (version, point budget, half-life), shared by every ?date=
+CHART_SCRIPTS_BYTES = 16 * 1024 * 1024
+_chart_scripts = MemoryTier(max_bytes=CHART_SCRIPTS_BYTES, ttl=2 * 86400)
 
-def convert_df_to_cacheable(df):
-    """Convert Pandas DataFrame to simple Python structures"""
-    return [
-        {
-            'date': row['date'].strftime('%Y-%m-%d'),
-            **{
-                col: (
-                    float(val)
-                    if not pd.isna(val) and not isinstance(val, (str, pd.Timestamp))
-                    else str(val) if not pd.isna(val) else None
-                )
-                for col, val in row.items()
-                if col != 'date'
-            }
-        }
-        for _, row in df.iterrows()
-    ]
+def chart_scripts(key, build_payload):
+    """Rendered chart scripts for key, building the payload only on a miss"""
+    markup = _chart_scripts.get(key)
+    if markup is None:
+        payload = build_payload()
+        with timed('chart_scripts'):
+            markup = ''.join(to_xml(script) for script in create_chart_scripts(payload))
+        _chart_scripts.set(key, markup)
+    return NotStr(markup)
 
 @rt('/')
 def home(request):
-    log_visit({'request': request, 'headers': dict(request.headers)})
-
-    # Try Redis cache
-    redis_client = get_redis_connection()
-    df = df_weighted_ma = all_party_columns = None
-
-    if redis_client:
-        try:
-            metadata = get_from_redis(redis_client, 'polls:metadata')
-            if metadata:
-                all_party_columns = set(metadata['party_columns'])
-                raw_data = get_from_redis(redis_client, 'polls:raw_data')
-                ma_data = get_from_redis(redis_client, 'polls:ma_data')
-                if raw_data and ma_data:
-                    df = pd.DataFrame(raw_data)
-                    df['date'] = pd.to_datetime(df['date'])
-                    df_weighted_ma = pd.DataFrame(ma_data)
-                    df_weighted_ma['date'] = pd.to_datetime(df_weighted_ma['date'])
-        except Exception as e:
-            print(f"Cache read error: {e}")
-
-    if df is None or df_weighted_ma is None or all_party_columns is None:
-        df, all_party_columns = load_and_preprocess_data()
-        df = filter_data(df, all_party_columns)
-        df_weighted_ma = calculate_weighted_ma(df)
-        if redis_client:
-            try:
-                metadata = {'party_columns': list(all_party_columns), 'last_update': datetime.now().isoformat()}
-                store_in_redis(redis_client, 'polls:metadata', metadata, 86400)
-                store_in_redis(redis_client, 'polls:raw_data', convert_df_to_cacheable(df), 3600)
-                store_in_redis(redis_client, 'polls:ma_data', convert_df_to_cacheable(df_weighted_ma), 3600)
-            except Exception as e:
-                print(f"Cache write error: {e}")
-
-    latest_date = df_weighted_ma['date'].max()
-    latest_values = df_weighted_ma.iloc[-1]
-    dates = df['date'].dt.strftime('%Y-%m-%d').tolist()
+    log_visit({'request': request})
+
+    # The page only changes with the data and with the displayed date
     today_str = datetime.now().strftime('%d/%m/%Y')
+    max_points = normalize_point_budget(request.query_params.get('points', DEFAULT_POINT_BUDGET))
+    halflife = normalize_halflife(request.query_params.get('halflife'))
+    selected_date = parse_selected_date(request.query_params.get('date'))
+    artifact = get_artifact()
+    if (artifact is not None and max_points in artifact.charts and halflife == DEFAULT_HALFLIFE
+            and (artifact.daily or selected_date is None)):
+        index = DailyIndex.from_json(artifact.daily) if artifact.daily else None
+        selected_date = clamp_selected_date(index, selected_date)
+        def render_artifact():
+            summary = index.summary_as_of(selected_date) if selected_date else artifact.summary
+            scripts = chart_scripts(f"{artifact.version}:{max_points}:{halflife}", lambda: artifact.charts[max_points])
+            return to_xml(render_home(summary, scripts, today_str, halflife, max_points,
+                                      index, selected_date, og_image_url(artifact.version)))
+        page_key = f"{today_str}:{max_points}:{halflife}:{selected_date or ''}"
+        page = get_or_render(f"home:{artifact.version}:{page_key}", render_artifact)
+        return page_response(request, page)
+
+    from components.dataset import (get_snapshot, get_snapshot_metadata, get_daily_index,
+                                    get_uncertainty_bands, with_halflife)
+    redis_client = get_redis_client()
+    version, stale = get_snapshot_metadata(redis_client)
+    headers = {'X-Data-Stale': '1'} if stale else None
+    if version and selected_date is None:
+        page = get_page(f"home:{version}:{today_str}:{max_points}:{halflife}:")
+        if page is not None:
+            return page_response(request, page, headers=headers)
+
+    snapshot = get_snapshot(redis_client)
+    index = get_daily_index(snapshot, halflife)
+    selected_date = clamp_selected_date(index, selected_date)
+    def render():
+        from components.chart_payload import build_chart_payload, build_home_summary
+        smoothed = with_halflife(snapshot, halflife)
+        with timed('summary'):
+            summary = index.summary_as_of(selected_date) if selected_date else build_home_summary(smoothed.df_weighted_ma)
+        def build_payload():
+            # The bands are bootstrapped around the default average only
+            bands = get_uncertainty_bands(snapshot) if halflife == DEFAULT_HALFLIFE else None
+            with timed('chart_payload'):
+                return build_chart_payload(smoothed.df, smoothed.df_weighted_ma, max_points, bands=bands)
+        scripts = chart_scripts(f"{snapshot.version}:{max_points}:{halflife}", build_payload)
+        with timed('render'):
+            return to_xml(render_home(summary, scripts, today_str, halflife, max_points, index, selected_date,
+                                      og_image_url(snapshot.version)))
+
+    page_key = f"{today_str}:{max_points}:{halflife}:{selected_date or ''}"
+    page = get_or_render(f"home:{snapshot.version}:{page_key}", render)
+    return page_response(request, page, headers={'X-Data-Stale': '1'} if snapshot.stale else None)
+
+def home_href(halflife, max_points, selected_date):
+    """Home page URL for these settings, leaving out the defaults"""
+    params = {}
+    if halflife != DEFAULT_HALFLIFE:
+        params['halflife'] = halflife
+    if max_points != DEFAULT_POINT_BUDGET:
+        params['points'] = max_points
+    if selected_date:
+        params['date'] = selected_date.isoformat()
+    return '/?' + '&'.join(f"{key}={value}" for key, value in params.items()) if params else '/'
+
+def smoothing_picker(halflife, max_points, selected_date=None):
+    """Links switching the half-life of the averages, keeping the other settings"""
+    return Div(
+        Span("Emivita della media:", cls="smoothing-label"),
+        *[A(f"{option} giorni", href=home_href(option, max_points, selected_date),
+            cls="smoothing-option active" if option == halflife else "smoothing-option")
+          for option in HALFLIFE_OPTIONS],
+        cls="smoothing-picker"
+    )
+
+def date_picker(index, selected_date, halflife, max_points):
+    """Form choosing the day the summary shows the averages of"""
+    hidden = {'halflife': halflife, 'points': max_points}
+    defaults = {'halflife': DEFAULT_HALFLIFE, 'points': DEFAULT_POINT_BUDGET}
+    return Form(
+        Label("Media al giorno:", fr="summary-date", cls="smoothing-label"),
+        Input(type="date", id="summary-date", name="date",
+              value=selected_date.isoformat() if selected_date else index.last_date.isoformat(),
+              min=index.first_date.isoformat(), max=index.last_date.isoformat()),
+        *[Input(type="hidden", name=name, value=value) for name, value in hidden.items() if value != defaults[name]],
+        Button("Vai", type="submit", cls="smoothing-option"),
+        A("Oggi", href=home_href(halflife, max_points, None), cls="smoothing-option") if selected_date else None,
+        method="get", action="/", cls="date-picker"
+    )
+
+def format_share(value):
+    return f"{value:.1f}%" if value is not None else "n/d"
+
+def render_home(summary, chart_scripts, today_str, halflife=DEFAULT_HALFLIFE, max_points=DEFAULT_POINT_BUDGET,
+                index=None, selected_date=None, og_image=None):
+    """Build the home page tree from build_home_summary() output and the chart_scripts() markup
+
+    With a DailyIndex the summary gets a date picker; summary then holds the
+    averages as of selected_date when one is given, or is None when that day
+    is before the first poll. og_image is the og:image URL, that of the
+    current data version by default.
+    """
     party_config = PARTY_CONFIG
-    datasets = prepare_chart_datasets(df, df_weighted_ma, dates, party_config)
-
-    # Calculate coalition values
-    coalition_data = {}
-    for date in df_weighted_ma['date']:
-        row = df_weighted_ma[df_weighted_ma['date'] == date].iloc[0]
-        for coalition, config in COALITION_CONFIG.items():
-            value = sum(row[f'{party}_MA'] for party in config['parties'] if f'{party}_MA' in row)
-            if coalition not in coalition_data:
-                coalition_data[coalition] = []
-            coalition_data[coalition].append(round(value, 1))
-
-    coalition_datasets = []
-    for coalition, config in COALITION_CONFIG.items():
-        coalition_datasets.append({
-            'label': coalition, 'data': coalition_data[coalition],
-            'borderColor': config['color'], 'backgroundColor': config['color'],
-            'borderWidth': 2, 'tension': 0.4, 'fill': False, 'pointRadius': 0
-        })
-
-    latest_coalition_values = {}
-    latest_row = df_weighted_ma.iloc[-1]
-    for coalition, config in COALITION_CONFIG.items():
-        value = sum(latest_row[f'{party}_MA'] for party in config['parties'] if f'{party}_MA' in latest_row)
-        latest_coalition_values[coalition] = round(value, 1)
+    og_image = og_image or og_image_url(current_version())
+    if summary is None:
+        summary = {'latest_date': "n/d", 'parties': {}, 'coalitions': dict.fromkeys(index.coalitions if index else [])}
+        summary_title = f"Nessun sondaggio prima del {index.first_date.strftime('%d/%m/%Y')}: la media non \u00e8 disponibile."
+    elif selected_date:
+        summary_title = f"Il {selected_date.strftime('%d/%m/%Y')} la media dei sondaggi era la seguente:"
+    else:
+        summary_title = f"Oggi \u00e8 il {today_str}. La media dei sondaggi \u00e8 la seguente:"
 
     return Html(
         Head(
@@ -161,24 +207,24 @@ def home(request):
             Meta(http_equiv="content-language", content="it"),
             Meta(property="og:title", content="Sondaggi Nazionali | Media Sondaggi Politici Italiani"),
             Meta(property="og:description", content="Media ponderata dei sondaggi politici italiani aggiornata quotidianamente. Analisi delle tendenze elettorali in Italia."),
-            Meta(property="og:image", content="https://sondagginazionali.it/static/og-image.png"),
+            Meta(property="og:image", content=og_image),
             Meta(property="og:url", content="https://sondagginazionali.it"),
             Meta(property="og:type", content="website"),
             Meta(name="twitter:card", content="summary_large_image"),
             Meta(name="twitter:site", content="@ruggsea"),
             Meta(name="twitter:title", content="Sondaggi Nazionali | Media Sondaggi Politici Italiani"),
             Meta(name="twitter:description", content="Media ponderata dei sondaggi politici italiani aggiornata quotidianamente."),
-            Meta(name="twitter:image", content="https://sondagginazionali.it/static/og-image.png"),
+            Meta(name="twitter:image", content=og_image),
             Link(rel="canonical", href="https://www.sondagginazionali.it"),
             Title("Sondaggi Nazionali | Media Sondaggi Politici Italiani"),
-            Link(rel="icon", type="image/png", href="/static/favicon.png"),
-            Link(rel="stylesheet", href="/static/styles.css"),
-            Link(rel="stylesheet", href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css"),
+            Link(rel="icon", type="image/png", href=asset_url("favicon.png")),
+            Link(rel="stylesheet", href=asset_url("styles.css")),
+            Link(rel="stylesheet", href=asset_url("font-awesome")),
         ),
         Body(
             Div(
-                Script(src="https://cdn.jsdelivr.net/npm/chart.js"),
-                Script(src="https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns"),
+                Script(src=asset_url("chart.js")),
+                Script(src=asset_url("chartjs-adapter-date-fns")),
                 Div(
                     Div(
                         Div(A("Expert Forecasting", href="/forecasting", cls="nav-link"), cls="left-links"),
@@ -192,12 +238,14 @@ def home(request):
                     H1("Sondaggi Nazionali", cls="title"),
                     Div(
                         Div(Canvas(id="pollChart"), cls="chart-card chart-container"),
+                        smoothing_picker(halflife, max_points, selected_date),
                         Div(
-                            P(f"Oggi \u00e8 il {today_str}. La media dei sondaggi \u00e8 la seguente:", cls="summary-title"),
+                            date_picker(index, selected_date, halflife, max_points) if index and index.values else None,
+                            P(summary_title, cls="summary-title"),
                             *[Div(Span(f"{party_config[abbr]['name']}:", cls="party-name"),
-                                  Span(f"{latest_values[abbr]:.1f}%", cls="party-value"),
+                                  Span(format_share(summary['parties'].get(abbr)), cls="party-value"),
                                   cls="party-row") for abbr in party_config],
-                            P(f"Ultimo sondaggio raccolto: {latest_date.strftime('%d/%m/%Y')}", cls="last-update"),
+                            P(f"Ultimo sondaggio raccolto: {summary['latest_date']}", cls="last-update"),
                             cls="summary-card"
                         ),
                         H2("Coalizioni", cls="section-title"),
@@ -205,8 +253,8 @@ def home(request):
                         Div(
                             P("Media delle coalizioni:", cls="summary-title"),
                             *[Div(Span(f"{coalition}:", cls="party-name"),
-                                  Span(f"{value:.1f}%", cls="party-value"),
-                                  cls="party-row") for coalition, value in latest_coalition_values.items()],
+                                  Span(format_share(value), cls="party-value"),
+                                  cls="party-row") for coalition, value in summary['coalitions'].items()],
                             cls="summary-card"
                         ),
                         cls="content"
@@ -223,19 +271,11 @@ def home(request):
                     ),
                     cls="container"
                 ),
-                *create_chart_scripts(dates, datasets, coalition_datasets)
+                chart_scripts
             )
         )
     )
 
-@rt('/robots.txt')
-def get_robots():
-    with open("static/robots.txt", "r") as f:
-        return Response(f.read(), headers={"Content-Type": "text/plain"})
-
-@rt('/sitemap.xml')
-def get_sitemap():
-    with open("static/sitemap.xml", "r") as f:
-        return Response(f.read(), headers={"Content-Type": "application/xml"})
+move_catch_all_static_last(app)
 
 serve()
@@ -1,33 +1,258 @@
 import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+import threading
+
+from components.halflives import HALFLIFE_OPTIONS, DEFAULT_HALFLIFE
+from components.schema import PARTY_DTYPE, date_column
+
+HALFLIFE = pd.Timedelta(days=DEFAULT_HALFLIFE)
+# Widest span, in half-lives, over which 2 ** age is taken before rebasing
+MAX_EXPONENT = 512
+
+# Define the mapping of full names to abbreviations
+PARTY_MAPPING = {
+    "Fratelli d'Italia": 'FDI',
+    'Partito Democratico': 'PD',
+    'Movimento 5 Stelle': 'M5S',
+    'Forza Italia': 'FI',
+    'Lega': 'LEGA',
+    'Alleanza Verdi Sinistra': 'AVS',
+    '+Europa': '+Europa',
+    'Azione': 'Azione',
+    'Italia Viva': 'Italia Viva',
+    'Altri': 'Altri'
+}
 
 def calculate_weighted_ma(df):
-    # Create a copy of the dataframe to store moving averages
-    df_ma = df.copy()
-    
-    # Define the mapping of full names to abbreviations
-    party_mapping = {
-        "Fratelli d'Italia": 'FDI',
-        'Partito Democratico': 'PD',
-        'Movimento 5 Stelle': 'M5S',
-        'Forza Italia': 'FI',
-        'Lega': 'LEGA',
-        'Alleanza Verdi Sinistra': 'AVS',
-        '+Europa': '+Europa',
-        'Azione': 'Azione',
-        'Italia Viva': 'Italia Viva',
-        'Altri': 'Altri'
-    }
-    
-    times=pd.DatetimeIndex(df['date'])
-    
+    times=pd.DatetimeIndex(date_column(df))
+
     # Calculate weighted moving average for each party
-    for party_name, party_abbr in party_mapping.items():
-        if party_name in df.columns:
-            values=df[party_name].ewm(halflife="14d", times=times).mean()
-            # Store the moving average in the new dataframe
-            df_ma[f'{party_abbr}_MA'] = values
-    # rename the columns
-    df_ma.rename(columns=party_mapping, inplace=True)
-    return df_ma
\ No newline at end of file
+    averages = {
+        f'{party_abbr}_MA': df[party_name].ewm(halflife=HALFLIFE, times=times).mean().astype(PARTY_DTYPE)
+        for party_name, party_abbr in PARTY_MAPPING.items()
+        if party_name in df.columns
+    }
+    # Renaming shares the poll columns with df rather than copying them
+    return df.rename(columns=PARTY_MAPPING).assign(**averages)
+
+def combine_frames(df, df_weighted_ma):
+    """df with the `_MA` columns of df_weighted_ma, the one frame stored for both"""
+    return df.assign(**{column: df_weighted_ma[column] for column in df_weighted_ma.columns if column.endswith('_MA')})
+
+def split_frames(frame):
+    """(df, df_weighted_ma) of a combine_frames() frame, both sharing its columns"""
+    df = frame.drop(columns=[column for column in frame.columns if column.endswith('_MA')])
+    return df, frame.rename(columns=PARTY_MAPPING)
+
+@dataclass
+class EwmaState:
+    """Running sums behind the EWMA of every party at every processed row
+
+    The average at row i is weighted[i] / mass[i], where both are sums over the
+    polls seen so far decayed to times[i]. Keeping them per row (rather than only
+    the last value, timestamp and weight mass) also lets old rows be dropped from
+    the front of the window without a recompute.
+    """
+    parties: list
+    times: pd.DatetimeIndex
+    weighted: np.ndarray
+    mass: np.ndarray
+    counts: np.ndarray
+    row_hashes: np.ndarray
+
+    def average(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.counts > 0, self.weighted / self.mass, np.nan)
+
+def ewma_sums(values, times, halflife=HALFLIFE, carry=None):
+    """Advance the EWMA sums over a block of rows in one vectorized pass
+
+    Matches pandas `ewm(halflife=..., times=...)` with adjust=True: every poll
+    has weight 0.5 ** (age / halflife). carry is (time, weighted, mass, counts)
+    at the end of the previous block.
+    """
+    observed = ~np.isnan(values)
+    # Exponents are relative to the block start so the cumulative sums stay finite
+    origin = times[0] if carry is None else carry[0]
+    age = np.asarray((times - origin) / halflife, dtype='float64')[:, None]
+    growth = np.exp2(age)
+    weighted = np.cumsum(np.where(observed, values, 0.0) * growth, axis=0)
+    mass = np.cumsum(observed * growth, axis=0)
+    counts = np.cumsum(observed, axis=0)
+    if carry is not None:
+        _, carry_weighted, carry_mass, carry_counts = carry
+        weighted += carry_weighted
+        mass += carry_mass
+        counts += carry_counts
+    decay = np.exp2(-age)
+    return weighted * decay, mass * decay, counts
+
+def _row_hashes(df, parties):
+    return pd.util.hash_pandas_object(df[['date', *parties]], index=False).to_numpy()
+
+def _frame_from_state(df, state):
+    averages = state.average()
+    ma_columns = {f'{PARTY_MAPPING[party]}_MA': averages[:, j].astype(PARTY_DTYPE) for j, party in enumerate(state.parties)}
+    df_ma = df.rename(columns=PARTY_MAPPING)
+    return df_ma.assign(**{name: pd.Series(values, index=df.index) for name, values in ma_columns.items()})
+
+def build_ewma_state(df, halflife=HALFLIFE):
+    """Compute the full EWMA state of a date-sorted poll frame"""
+    parties = [party for party in PARTY_MAPPING if party in df.columns]
+    times = pd.DatetimeIndex(date_column(df))
+    values = df[parties].to_numpy(dtype='float64')
+    weighted, mass, counts = ewma_sums(values, times, halflife)
+    return EwmaState(parties, times, weighted, mass, counts, _row_hashes(df, parties))
+
+def advance_ewma_state(state, df, halflife=HALFLIFE):
+    """Bring state in line with df, touching only rows added or dropped since
+
+    Returns None when df is not the previous rows (minus some from the front)
+    followed by newer ones, e.g. when a poll was inserted out of order.
+    """
+    parties = [party for party in PARTY_MAPPING if party in df.columns]
+    if parties != state.parties or len(df) == 0:
+        return None
+    hashes = _row_hashes(df, parties)
+
+    # The rows we still have must be exactly the start of df
+    first_date = date_column(df).iloc[0]
+    low = state.times.searchsorted(first_date, side='left')
+    high = state.times.searchsorted(first_date, side='right')
+    candidates = low + np.flatnonzero(state.row_hashes[low:high] == hashes[0])
+    start = next((
+        int(candidate) for candidate in candidates
+        if len(state.row_hashes) - candidate <= len(hashes)
+        and np.array_equal(state.row_hashes[candidate:], hashes[:len(state.row_hashes) - candidate])
+    ), None)
+    if start is None:
+        return None
+    kept = len(state.row_hashes) - start
+
+    times = pd.DatetimeIndex(date_column(df))
+    weighted, mass, counts = state.weighted[start:], state.mass[start:], state.counts[start:]
+    if start > 0:
+        # Take out what the dropped rows still contribute, decayed to each kept row
+        dropped_at = state.times[start - 1]
+        decay = np.exp2(-np.asarray((times[:kept] - dropped_at) / halflife, dtype='float64'))[:, None]
+        weighted = weighted - state.weighted[start - 1] * decay
+        mass = mass - state.mass[start - 1] * decay
+        counts = counts - state.counts[start - 1]
+
+    if kept < len(df):
+        carry = (times[kept - 1], weighted[-1], mass[-1], counts[-1])
+        values = df[parties].iloc[kept:].to_numpy(dtype='float64')
+        new_weighted, new_mass, new_counts = ewma_sums(values, times[kept:], halflife, carry)
+        weighted = np.vstack([weighted, new_weighted])
+        mass = np.vstack([mass, new_mass])
+        counts = np.vstack([counts, new_counts])
+
+    return EwmaState(parties, times, weighted, mass, counts, hashes)
+
+def multi_halflife_ewma(values, times, halflives):
+    """EWMA of every column for several half-lives in one vectorized pass
+
+    values is (time × party). Returns a (half-life × party × time) array whose
+    slice [h] matches pandas `ewm(halflife=halflives[h], times=times).mean()`.
+    The decay common to the weighted sum and the weight mass cancels out of
+    their ratio, so it is only applied to what a segment carries into the
+    next. Segments are kept short enough for 2 ** age to stay finite; a few
+    years of polls fit in one.
+    """
+    values = np.asarray(values, dtype='float64').T[None]
+    averages = np.empty((len(halflives), values.shape[1], values.shape[2]))
+    if values.shape[2] == 0:
+        return averages
+    observed = ~np.isnan(values)
+    filled = np.where(observed, values, 0.0)
+    days = np.asarray((times - times[0]) / pd.Timedelta(days=1), dtype='float64')
+    halflife_days = np.array([halflife / pd.Timedelta(days=1) for halflife in halflives])
+    rate = (1.0 / halflife_days)[:, None, None]
+
+    mass = np.empty_like(averages)
+    carry_weighted, carry_mass, carry_day = 0.0, 0.0, 0.0
+    span = MAX_EXPONENT * halflife_days.min()
+    start = 0
+    while start < len(days):
+        end = int(np.searchsorted(days, days[start] + span, side='right'))
+        growth = np.exp2((days[start:end] - days[start]) * rate)
+        weighted, segment_mass = averages[..., start:end], mass[..., start:end]
+        np.cumsum(np.multiply(filled[..., start:end], growth, out=weighted), axis=2, out=weighted)
+        np.cumsum(np.multiply(observed[..., start:end], growth, out=segment_mass), axis=2, out=segment_mass)
+        if start > 0:
+            lead = np.exp2(-(days[start] - carry_day) * rate)
+            weighted += carry_weighted * lead
+            segment_mass += carry_mass * lead
+        last_decay = 1.0 / growth[..., -1:]
+        carry_weighted, carry_mass, carry_day = weighted[..., -1:] * last_decay, segment_mass[..., -1:] * last_decay, days[end - 1]
+        start = end
+
+    # No poll yet leaves 0 / 0, the NaN pandas gives too
+    with np.errstate(invalid='ignore'):
+        return np.divide(averages, mass, out=averages)
+
+@dataclass
+class SmoothedAverages:
+    """Averages of every party for each of several half-lives"""
+    halflives: tuple  # days
+    parties: list  # abbreviations
+    values: np.ndarray  # (half-life × party × time)
+
+    def apply(self, df_weighted_ma, halflife):
+        """df_weighted_ma with its `_MA` columns averaged over halflife days instead"""
+        averages = self.values[self.halflives.index(halflife)]
+        return df_weighted_ma.assign(**{
+            f'{abbr}_MA': pd.Series(averages[j].astype(PARTY_DTYPE), index=df_weighted_ma.index)
+            for j, abbr in enumerate(self.parties)
+        })
+
+    def to_frame(self):
+        """One `<days>:<party>` column per half-life and party, for utils.columnar"""
+        return pd.DataFrame({
+            f'{halflife}:{abbr}': self.values[h, j]
+            for h, halflife in enumerate(self.halflives)
+            for j, abbr in enumerate(self.parties)
+        })
+
+    @classmethod
+    def from_frame(cls, frame):
+        keys = [column.split(':', 1) for column in frame.columns]
+        halflives = tuple(dict.fromkeys(int(halflife) for halflife, _ in keys))
+        parties = list(dict.fromkeys(abbr for _, abbr in keys))
+        values = frame.to_numpy(dtype='float64').T.reshape(len(halflives), len(parties), len(frame))
+        return cls(halflives, parties, values)
+
+def build_smoothed_averages(df, halflives=HALFLIFE_OPTIONS):
+    """Average a date-sorted poll frame over every half-life in halflives (days)"""
+    parties = [party for party in PARTY_MAPPING if party in df.columns]
+    values = multi_halflife_ewma(
+        df[parties].to_numpy(dtype='float64'), pd.DatetimeIndex(date_column(df)),
+        [pd.Timedelta(days=halflife) for halflife in halflives]
+    )
+    return SmoothedAverages(tuple(halflives), [PARTY_MAPPING[party] for party in parties], values)
+
+class IncrementalWeightedMA:
+    """Keeps the EWMA state between rebuilds and advances it over new rows only"""
+    def __init__(self, halflife=HALFLIFE):
+        self.halflife = halflife
+        self.state = None
+        self.last_mode = None
+        self._lock = threading.Lock()
+
+    def update(self, df):
+        """Same result as calculate_weighted_ma(df), within floating point tolerance"""
+        with self._lock:
+            state = advance_ewma_state(self.state, df, self.halflife) if self.state is not None else None
+            self.last_mode = 'incremental' if state is not None else 'full'
+            if state is None:
+                state = build_ewma_state(df, self.halflife)
+            self.state = state
+            return _frame_from_state(df, state)
+
+_updater = IncrementalWeightedMA()
+
+def update_weighted_ma(df):
+    """Incremental calculate_weighted_ma using the process-wide EWMA state"""
+    return _updater.update(df)
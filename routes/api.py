@@ -0,0 +1,128 @@
+import json
+from datetime import date
+
+from starlette.responses import JSONResponse
+
+from config.party_config import PARTY_CONFIG, COALITION_CONFIG
+from components.point_budgets import normalize_point_budget, DEFAULT_POINT_BUDGET
+from components.halflives import parse_halflife, HALFLIFE_OPTIONS, DEFAULT_HALFLIFE
+from components.precomputed import get_artifact
+from utils.page_cache import get_page, get_or_render, page_response
+
+API_CACHE_CONTROL = "public, max-age=300"
+JSON_MEDIA_TYPE = "application/json"
+API_CHOICES = {
+    'polls': (list(PARTY_CONFIG), 'parties'),
+    'averages': (list(PARTY_CONFIG), 'parties'),
+    'coalitions': (list(COALITION_CONFIG), 'coalitions'),
+}
+# Endpoints built from the averages, which take ?halflife=
+SMOOTHED_APIS = ('averages', 'coalitions')
+
+class FilterError(ValueError):
+    """Raised for query parameters the API cannot honour"""
+
+def parse_filters(request, choices, param='parties'):
+    """Normalize the from/to/<param> query parameters so equal filters share a cache key"""
+    params = request.query_params
+    try:
+        start = date.fromisoformat(params['from']) if params.get('from') else None
+        end = date.fromisoformat(params['to']) if params.get('to') else None
+    except ValueError:
+        raise FilterError("'from' and 'to' must be dates in YYYY-MM-DD format")
+    if start and end and start > end:
+        raise FilterError("'from' must not be after 'to'")
+
+    selected = [name.strip() for name in params.get(param, '').split(',') if name.strip()]
+    unknown = [name for name in selected if name not in choices]
+    if unknown:
+        raise FilterError(f"Unknown {param}: {', '.join(unknown)}. Choose from: {', '.join(choices)}")
+    selected = [name for name in choices if name in selected] or list(choices)
+    return start, end, selected
+
+def parse_halflife_filter(request):
+    """The ?halflife= of a request, in days"""
+    halflife = parse_halflife(request.query_params.get('halflife'))
+    if halflife is None:
+        raise FilterError(f"'halflife' must be one of: {', '.join(map(str, HALFLIFE_OPTIONS))}")
+    return halflife
+
+def cached_response(request, key, render_from_snapshot, precomputed=None):
+    """Serve key from the precomputed artifact or the per-version cache, rendering on a miss
+
+    render_from_snapshot is only called, and pandas only imported, when neither has it.
+    """
+    artifact = get_artifact()
+    if artifact is not None and precomputed is not None:
+        body = precomputed(artifact)
+        if body is not None:
+            page = get_or_render(f"api:{key}:{artifact.version}", lambda: body, JSON_MEDIA_TYPE)
+            return page_response(request, page, API_CACHE_CONTROL)
+
+    from components.dataset import get_snapshot, get_snapshot_metadata
+    version, stale = get_snapshot_metadata()
+    if version:
+        page = get_page(f"api:{key}:{version}")
+        if page is not None:
+            return page_response(request, page, API_CACHE_CONTROL, {'X-Data-Stale': '1'} if stale else None)
+
+    snapshot = get_snapshot()
+    page = get_or_render(f"api:{key}:{snapshot.version}", lambda: render_from_snapshot(snapshot), JSON_MEDIA_TYPE)
+    return page_response(request, page, API_CACHE_CONTROL, {'X-Data-Stale': '1'} if snapshot.stale else None)
+
+def api_response(request, name):
+    """Answer /api/<name>; unfiltered requests can come straight from the artifact"""
+    choices, param = API_CHOICES[name]
+    try:
+        start, end, selected = parse_filters(request, choices, param)
+        halflife = parse_halflife_filter(request) if name in SMOOTHED_APIS else DEFAULT_HALFLIFE
+    except FilterError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    def render(snapshot):
+        from components.api_payloads import render_payload
+        from components.dataset import with_halflife
+        return render_payload(with_halflife(snapshot, halflife), name, start, end, selected)
+
+    unfiltered = start is None and end is None and selected == choices and halflife == DEFAULT_HALFLIFE
+    return cached_response(
+        request, f"{name}:{start}:{end}:{','.join(selected)}:{halflife}", render,
+        (lambda artifact: artifact.api.get(name)) if unfiltered else None
+    )
+
+def chart_response(request):
+    """The compact payload the home page charts are drawn from, per (version, budget)"""
+    max_points = normalize_point_budget(request.query_params.get('points', DEFAULT_POINT_BUDGET))
+    try:
+        halflife = parse_halflife_filter(request)
+    except FilterError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    def render(snapshot):
+        from components.api_payloads import render_chart_payload
+        from components.dataset import get_uncertainty_bands, with_halflife
+        bands = get_uncertainty_bands(snapshot) if halflife == DEFAULT_HALFLIFE else None
+        return render_chart_payload(with_halflife(snapshot, halflife), max_points, bands)
+
+    def precomputed(artifact):
+        payload = artifact.charts.get(max_points) if halflife == DEFAULT_HALFLIFE else None
+        return json.dumps(payload, separators=(',', ':')) if payload is not None else None
+
+    return cached_response(request, f"chart:{max_points}:{halflife}", render, precomputed)
+
+def register_api_routes(rt):
+    @rt('/api/polls')
+    def api_polls(request):
+        return api_response(request, 'polls')
+
+    @rt('/api/averages')
+    def api_averages(request):
+        return api_response(request, 'averages')
+
+    @rt('/api/coalitions')
+    def api_coalitions(request):
+        return api_response(request, 'coalitions')
+
+    @rt('/api/chart')
+    def api_chart(request):
+        return chart_response(request)
@@ -1,98 +1,108 @@
-from fasthtml.common import Html, Head, Body, Title, Link, Div, A, H1, H2, P, Script, Meta, Header, Main, Footer
+from fasthtml.common import Html, Head, Body, Title, Link, Div, A, H1, H2, P, Script, Meta, Header, Main, Footer, to_xml
 
-def register_forecasting_routes(rt):
-    @rt('/forecasting')
-    def forecasting():
-        return Html(
-            Head(
-                Meta(charset="UTF-8"),
-                Meta(name="viewport", content="width=device-width, initial-scale=1.0"),
-                Meta(name="description", content="Expert forecasting e prediction markets per le elezioni politiche italiane."),
-                
-                Meta(property="og:title", content="Expert Forecasting | Sondaggi Nazionali"),
-                Meta(property="og:description", content="Expert forecasting e prediction markets per le elezioni politiche italiane."),
-                Meta(property="og:image", content="https://sondagginazionali.it/static/og-image.png"),
-                Meta(property="og:url", content="https://sondagginazionali.it/forecasting"),
-                Meta(property="og:type", content="website"),
-                
-                Title("Expert Forecasting"),
-                Link(rel="icon", type="image/png", href="/static/favicon.png"),
-                Link(rel="stylesheet", href="/static/styles.css"),
-                Link(
-                    rel="stylesheet",
-                    href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css"
-                ),
-            ),
-            Body(
-                # External resources
-                Link(rel="stylesheet", href="/static/styles.css"),
-                
-                # Navbar
+from utils.assets import asset_url
+from utils.logger import log_visit
+from utils.page_cache import get_or_render, page_response
+from routes.og_image import og_image_url, current_version
+
+def render_forecasting(og_image):
+    """The Expert Forecasting page, linking og_image as its preview"""
+    return Html(
+        Head(
+            Meta(charset="UTF-8"),
+            Meta(name="viewport", content="width=device-width, initial-scale=1.0"),
+            Meta(name="description", content="Expert forecasting e prediction markets per le elezioni politiche italiane."),
+            
+            Meta(property="og:title", content="Expert Forecasting | Sondaggi Nazionali"),
+            Meta(property="og:description", content="Expert forecasting e prediction markets per le elezioni politiche italiane."),
+            Meta(property="og:image", content=og_image),
+            Meta(property="og:url", content="https://sondagginazionali.it/forecasting"),
+            Meta(property="og:type", content="website"),
+            
+            Title("Expert Forecasting"),
+            Link(rel="icon", type="image/png", href=asset_url("favicon.png")),
+            Link(rel="stylesheet", href=asset_url("styles.css")),
+            Link(rel="stylesheet", href=asset_url("font-awesome")),
+        ),
+        Body(
+            # External resources
+            Link(rel="stylesheet", href=asset_url("styles.css")),
+            
+            # Navbar
+            Div(
                 Div(
                     Div(
-                        Div(
-                            A("Expert Forecasting", href="/forecasting", cls="nav-link"),
-                            cls="left-links"
-                        ),
-                        A("Sondaggi Nazionali", href="/", cls="nav-brand"),
-                        Div(
-                            A("About", href="/about", cls="nav-link"),
-                            cls="right-links"
-                        ),
-                        cls="navbar-content"
+                        A("Expert Forecasting", href="/forecasting", cls="nav-link"),
+                        cls="left-links"
+                    ),
+                    A("Sondaggi Nazionali", href="/", cls="nav-brand"),
+                    Div(
+                        A("About", href="/about", cls="nav-link"),
+                        cls="right-links"
                     ),
-                    cls="navbar"
+                    cls="navbar-content"
                 ),
-                
-                # Container with main content
+                cls="navbar"
+            ),
+            
+            # Container with main content
+            Div(
                 Div(
+                    H1("Expert Forecasting", cls="title"),
                     Div(
-                        H1("Expert Forecasting", cls="title"),
+                        H2("Prediction Markets e Forecasting", cls="section-title"),
+                        P("""
+                            I prediction markets rappresentano uno strumento innovativo per prevedere eventi 
+                            futuri, inclusi risultati politici. La letteratura accademica ha dimostrato 
+                            ripetutamente la loro efficacia predittiva, spesso superando metodi tradizionali 
+                            come i sondaggi.
+                        """),
+                        
+                        P("""
+                            Nonostante il loro potenziale, al momento non esistono mercati attivi sulle 
+                            principali piattaforme di prediction markets (come Polymarket) per le elezioni 
+                            italiane. Questa sezione è quindi un work in progress, che verrà aggiornata 
+                            non appena saranno disponibili nuovi strumenti di previsione.
+                        """),
+                        
+                        H2("Previsioni di Metaculus", cls="section-title"),
+                        P("""
+                            Nel frattempo, è possibile consultare le previsioni degli esperti su Metaculus, 
+                            una piattaforma di forecasting che aggrega le previsioni di forecaster esperti:
+                        """),
+                        
+                        # Metaculus embed using a div with innerHTML
                         Div(
-                            H2("Prediction Markets e Forecasting", cls="section-title"),
-                            P("""
-                                I prediction markets rappresentano uno strumento innovativo per prevedere eventi 
-                                futuri, inclusi risultati politici. La letteratura accademica ha dimostrato 
-                                ripetutamente la loro efficacia predittiva, spesso superando metodi tradizionali 
-                                come i sondaggi.
-                            """),
-                            
-                            P("""
-                                Nonostante il loro potenziale, al momento non esistono mercati attivi sulle 
-                                principali piattaforme di prediction markets (come Polymarket) per le elezioni 
-                                italiane. Questa sezione è quindi un work in progress, che verrà aggiornata 
-                                non appena saranno disponibili nuovi strumenti di previsione.
-                            """),
-                            
-                            H2("Previsioni di Metaculus", cls="section-title"),
-                            P("""
-                                Nel frattempo, è possibile consultare le previsioni degli esperti su Metaculus, 
-                                una piattaforma di forecasting che aggrega le previsioni di forecaster esperti:
+                            Script("""
+                                document.currentScript.parentElement.innerHTML = `
+                                    <iframe 
+                                        src="https://www.metaculus.com/questions/embed/19630?theme=light&embedTitle=Which+party+will+win+the+most+seats+in+the+Chamber+of+Deputies+in+the+next+Italian+election%3F&zoom=all" 
+                                        style="height:430px; width:100%; max-width:550px; border:none;"
+                                    ></iframe>
+                                `;
                             """),
-                            
-                            # Metaculus embed using a div with innerHTML
-                            Div(
-                                Script("""
-                                    document.currentScript.parentElement.innerHTML = `
-                                        <iframe 
-                                            src="https://www.metaculus.com/questions/embed/19630?theme=light&embedTitle=Which+party+will+win+the+most+seats+in+the+Chamber+of+Deputies+in+the+next+Italian+election%3F&zoom=all" 
-                                            style="height:430px; width:100%; max-width:550px; border:none;"
-                                        ></iframe>
-                                    `;
-                                """),
-                                cls="metaculus-embed",
-                                style="display: flex; justify-content: center; align-items: center; width: 100%; margin: 20px 0;"
-                            ),
-                            
-                            cls="about-content"
+                            cls="metaculus-embed",
+                            style="display: flex; justify-content: center; align-items: center; width: 100%; margin: 20px 0;"
                         ),
-                        Div(
-                            A("← Torna alla home", href="/", cls="back-link"),
-                            cls="navigation"
-                        ),
-                        cls="content"
+                        
+                        cls="about-content"
                     ),
-                    cls="container"
-                )
+                    Div(
+                        A("← Torna alla home", href="/", cls="back-link"),
+                        cls="navigation"
+                    ),
+                    cls="content"
+                ),
+                cls="container"
             )
-        ) 
\ No newline at end of file
+        )
+    ) 
+
+def register_forecasting_routes(rt):
+    @rt('/forecasting')
+    def forecasting(request):
+        log_visit({'request': request})
+        # Only the og:image changes, with the data version
+        version = current_version()
+        page = get_or_render(f"forecasting:{version}", lambda: to_xml(render_forecasting(og_image_url(version))))
+        return page_response(request, page)
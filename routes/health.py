@@ -0,0 +1,13 @@
+from utils.redis_client import pool_stats
+from utils.logger import visit_log_stats
+from components.precomputed import get_artifact
+
+def register_health_routes(rt):
+    @rt('/health')
+    def health():
+        status = {'status': 'ok', 'redis_pool': pool_stats(), 'visit_log': visit_log_stats()}
+        artifact = get_artifact()
+        if artifact is not None:
+            return {**status, 'artifact': {'version': artifact.version, 'built_at': artifact.built_at}}
+        from components.dataset import coordinator, cache_stats, rejection_report
+        return {**status, 'refresh': dict(coordinator.stats), 'cache': cache_stats(), 'rejections': rejection_report()}
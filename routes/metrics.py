@@ -0,0 +1,19 @@
+from starlette.responses import Response
+
+from utils.metrics import gauge, render_metrics
+from utils.redis_client import pool_stats
+from utils.logger import visit_log_stats
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _pool_connections():
+    stats = pool_stats()
+    return {(('state', state),): stats.get(f'{state}_connections') for state in ('in_use', 'idle', 'created')}
+
+gauge('redis_pool_connections', "Connections of the Redis pool by state", _pool_connections)
+gauge('visit_log_queued', "Visit records waiting to be flushed to Redis", lambda: visit_log_stats()['queued'])
+
+def register_metrics_routes(rt):
+    @rt('/metrics')
+    def metrics():
+        return Response(render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,61 @@
+import base64
+
+from starlette.responses import RedirectResponse
+
+from components import og_image
+from components.precomputed import get_artifact
+from utils.assets import asset_url, IMMUTABLE_CACHE_CONTROL
+from utils.page_cache import build_page, get_page, store_page, page_response
+
+SITE_URL = "https://sondagginazionali.it"
+
+def rendered_og_image(version):
+    """PNG of version from the precomputed artifact or the caches, or None; requests never render it"""
+    artifact = get_artifact()
+    if artifact is not None:
+        return base64.b64decode(artifact.og_image) if artifact.og_image and artifact.version == version else None
+    if not og_image.available():
+        return None
+    from components.dataset import cached_og_image
+    return cached_og_image(version)
+
+def current_version():
+    """Data version pages are served from: the artifact's, else the published snapshot's
+
+    Only the snapshot metadata is read, and pandas is never imported for an artifact.
+    """
+    artifact = get_artifact()
+    if artifact is not None:
+        return artifact.version
+    from components.dataset import get_snapshot_metadata
+    return get_snapshot_metadata()[0]
+
+def og_image_url(version):
+    """Absolute og:image URL of version if its image is rendered, else of the static image"""
+    artifact = get_artifact()
+    if artifact is not None:
+        rendered = bool(artifact.og_image) and version == artifact.version
+    elif og_image.available() and version is not None:
+        from components.dataset import cached_og_image
+        rendered = cached_og_image(version) is not None
+    else:
+        rendered = False
+    if rendered:
+        return f"{SITE_URL}/og/{version}.png"
+    return SITE_URL + asset_url("og-image.png")
+
+def og_image_response(request, version):
+    page = get_page(f"og:{version}")
+    if page is None:
+        png = rendered_og_image(version)
+        if png is None:
+            # Superseded or not rendered here: the static image, without caching the redirect
+            return RedirectResponse(asset_url("og-image.png"), status_code=307)
+        page = store_page(f"og:{version}", build_page(png, "image/png", compress=False))
+    # The URL changes with the data version, so its content never does
+    return page_response(request, page, IMMUTABLE_CACHE_CONTROL)
+
+def register_og_image_routes(rt):
+    @rt('/og/{version}.png')
+    def get_og_image(request, version: str):
+        return og_image_response(request, version)
@@ -0,0 +1,53 @@
+from datetime import date
+
+from starlette.responses import JSONResponse
+
+from components.daily_index import DailyIndex
+from components.halflives import DEFAULT_HALFLIFE
+from components.precomputed import get_artifact
+from routes.api import API_CACHE_CONTROL, FilterError, parse_halflife_filter
+
+def load_daily_index(halflife=DEFAULT_HALFLIFE):
+    """Return (index, version, stale), from the precomputed artifact when it has the index"""
+    artifact = get_artifact()
+    if artifact is not None and artifact.daily and halflife == DEFAULT_HALFLIFE:
+        return DailyIndex.from_json(artifact.daily), artifact.version, False
+    from components.dataset import get_snapshot, get_daily_index
+    snapshot = get_snapshot()
+    return get_daily_index(snapshot, halflife), snapshot.version, snapshot.stale
+
+def parse_day(value, name):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise FilterError(f"'{name}' must be a date in YYYY-MM-DD format")
+
+def snapshot_response(request):
+    """Averages as of ?date= (default: the latest) and, with ?since=, their change since then"""
+    params = request.query_params
+    try:
+        day = parse_day(params.get('date'), 'date')
+        since = parse_day(params.get('since'), 'since')
+        halflife = parse_halflife_filter(request)
+    except FilterError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    index, version, stale = load_daily_index(halflife)
+    day = day or index.last_date
+    averages = index.as_of(day)
+    if averages is None or (since and index.offset(since) is None):
+        return JSONResponse({'error': f"No averages before {index.first_date.isoformat()}"}, status_code=404)
+
+    body = {'version': version, 'halflife': halflife, **averages}
+    if since:
+        body['change'] = {'since': date.fromordinal(index.first_day + index.offset(since)).isoformat(),
+                          **index.change(since, day)}
+    headers = {'Cache-Control': API_CACHE_CONTROL}
+    if stale:
+        headers['X-Data-Stale'] = '1'
+    return JSONResponse(body, headers=headers)
+
+def register_snapshot_routes(rt):
+    @rt('/snapshot')
+    def snapshot(request):
+        return snapshot_response(request)
@@ -0,0 +1,31 @@
+from starlette.responses import Response
+
+from utils.assets import get_registry, IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL
+from utils.page_cache import page_response
+
+def serve_asset(request, path):
+    asset = get_registry().get(path)
+    if asset is None:
+        return Response("Not Found", status_code=404)
+    cache_control = IMMUTABLE_CACHE_CONTROL if asset.fingerprinted else MUTABLE_CACHE_CONTROL
+    return page_response(request, asset.page, cache_control)
+
+def register_static_routes(rt):
+    @rt('/static/{path:path}')
+    def static_asset(request, path: str):
+        return serve_asset(request, path)
+
+    @rt('/robots.txt')
+    def get_robots(request):
+        return serve_asset(request, 'robots.txt')
+
+    @rt('/sitemap.xml')
+    def get_sitemap(request):
+        return serve_asset(request, 'sitemap.xml')
+
+def move_catch_all_static_last(app):
+    """fast_app registers its catch-all static file route first; let explicit routes match before it"""
+    catch_all = [route for route in app.router.routes if getattr(route, 'path', '') == '/{fname:path}.{ext:static}']
+    for route in catch_all:
+        app.router.routes.remove(route)
+        app.router.routes.append(route)
@@ -0,0 +1,90 @@
+from fasthtml.common import *
+from starlette.responses import JSONResponse
+
+from utils.analytics import read_stats
+from utils.assets import asset_url
+from utils.redis_client import get_redis_client, report_redis_error, report_redis_success
+
+STATS_DAYS = 30
+
+def stat_rows(rows):
+    return [Div(Span(f"{label}:", cls="party-name"), Span(f"{value:,}".replace(',', '.'), cls="party-value"), cls="party-row")
+            for label, value in rows]
+
+def stats_table(headers, rows):
+    return Table(
+        Thead(Tr(*[Th(header) for header in headers])),
+        Tbody(*[Tr(*[Td(cell) for cell in row]) for row in rows]),
+        cls="stats-table"
+    )
+
+def render_stats(stats):
+    if stats is None:
+        content = [Div(P("Statistiche non disponibili: Redis non raggiungibile.", cls="summary-title"), cls="summary-card")]
+    else:
+        content = [
+            Div(
+                P("Visite (UTC)", cls="summary-title"),
+                *stat_rows([
+                    ("Pagine viste, 7 giorni", stats['views']['7d']),
+                    (f"Pagine viste, {STATS_DAYS} giorni", stats['views'][f'{STATS_DAYS}d']),
+                    ("Visitatori unici stimati, 7 giorni", stats['uniques']['7d']),
+                    (f"Visitatori unici stimati, {STATS_DAYS} giorni", stats['uniques'][f'{STATS_DAYS}d']),
+                ]),
+                cls="summary-card"
+            ),
+            Div(P("Provenienza", cls="summary-title"), *stat_rows(stats['referrers']), cls="summary-card"),
+            Div(P("Browser", cls="summary-title"), *stat_rows(stats['agents']), cls="summary-card"),
+            H2("Per giorno", cls="section-title"),
+            stats_table(("Giorno", "Pagine viste", "Visitatori unici"),
+                        [(day['date'], day['views'], day['uniques']) for day in stats['days']]),
+            H2("Ultime 48 ore", cls="section-title"),
+            stats_table(("Ora", "Pagine viste"), [(hour['hour'], hour['views']) for hour in stats['hours']]),
+        ]
+
+    return Html(
+        Head(
+            Meta(charset="UTF-8"),
+            Meta(name="viewport", content="width=device-width, initial-scale=1.0"),
+            Meta(name="robots", content="noindex, nofollow"),
+            Title("Statistiche | Sondaggi Nazionali"),
+            Link(rel="icon", type="image/png", href=asset_url("favicon.png")),
+            Link(rel="stylesheet", href=asset_url("styles.css")),
+        ),
+        Body(
+            Div(
+                Div(
+                    Div(A("Expert Forecasting", href="/forecasting", cls="nav-link"), cls="left-links"),
+                    A("Sondaggi Nazionali", href="/", cls="nav-brand"),
+                    Div(A("About", href="/about", cls="nav-link"), cls="right-links"),
+                    cls="navbar-content"
+                ),
+                cls="navbar"
+            ),
+            Div(H1("Statistiche", cls="title"), Div(*content, cls="content"), cls="container")
+        )
+    )
+
+def load_stats():
+    """The rollups of the last STATS_DAYS days, or None without Redis"""
+    redis_client = get_redis_client()
+    if not redis_client:
+        return None
+    try:
+        stats = read_stats(redis_client, days=STATS_DAYS)
+        report_redis_success()
+        return stats
+    except Exception as e:
+        print(f"Error reading visit stats: {e}")
+        report_redis_error(e)
+        return None
+
+def register_stats_routes(rt):
+    @rt('/stats')
+    def stats(request):
+        stats = load_stats()
+        if request.query_params.get('format') == 'json':
+            if stats is None:
+                return JSONResponse({'error': "Visit statistics are unavailable"}, status_code=503)
+            return JSONResponse(stats, headers={'Cache-Control': 'no-store'})
+        return render_stats(stats)
@@ -1,56 +1,37 @@
-from PIL import Image, ImageDraw, ImageFont
+"""Render the og:image of the current polls to a PNG file
+
+The site renders this image itself at every refresh (components/og_image.py);
+this script refreshes static/og-image.png, the fallback pages link to until
+then, or writes a preview elsewhere:
+
+    python scripts/generate_og_image.py [--output static/og-image.png]
+"""
+import argparse
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.chart_payload import build_home_summary
+from components.daily_index import build_daily_index
+from components.dataset import build_snapshot
+from components.og_image import render_og_image
+
+DEFAULT_OUTPUT = os.path.join('static', 'og-image.png')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot()
+    png = render_og_image(build_home_summary(snapshot.df_weighted_ma), build_daily_index(snapshot.df_weighted_ma))
+    if png is None:
+        sys.exit("Pillow is required to render the image: pip install pillow")
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'wb') as f:
+        f.write(png)
+    print(f"Wrote {args.output} ({len(png) / 1024:.0f} KiB)")
 
-# Create a new image with a white background
-width = 1200  # recommended OG image width
-height = 630  # recommended OG image height
-background_color = "#ffffff"
-
-img = Image.new('RGB', (width, height), background_color)
-draw = ImageDraw.Draw(img)
-
-# Try different system emoji fonts
-font = None
-font_size = 200
-
-# List of common emoji font paths on different systems
-font_paths = [
-    'seguiemj.ttf',  # Windows
-    '/System/Library/Fonts/Apple Color Emoji.ttf',  # macOS
-    '/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf',  # Linux
-    'NotoColorEmoji.ttf',  # Some Linux
-]
-
-for font_path in font_paths:
-    try:
-        font = ImageFont.truetype(font_path, font_size)
-        break
-    except (OSError, IOError):
-        continue
-
-if font is None:
-    raise Exception("Could not find a suitable emoji font")
-
-# Use trending up emoji
-emoji = "📈"
-
-# Get the size that the text will take
-text_bbox = draw.textbbox((0, 0), emoji, font=font)
-text_width = text_bbox[2] - text_bbox[0]
-text_height = text_bbox[3] - text_bbox[1]
-
-# Calculate position for emoji with visual center offset
-center_x = width / 2
-center_y = height / 2
-visual_center_offset = text_height * 0.4  # 40% from top
-emoji_x = center_x - (text_width / 2)
-emoji_y = center_y - visual_center_offset
-
-# Draw the emoji
-draw.text((emoji_x, emoji_y), emoji, font=font, fill="#000000")
-
-# Ensure the static directory exists
-os.makedirs('static', exist_ok=True)
-
-# Save the image
-img.save('static/og-image.png') 
\ No newline at end of file
+if __name__ == '__main__':
+    main()
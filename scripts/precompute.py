@@ -0,0 +1,57 @@
+"""Build the ready-to-serve artifact read by components/precomputed.py
+
+Fetches and processes the polls once, at build time, and writes the home page
+figures, the chart payload of every point budget, the unfiltered API bodies,
+the daily index of averages and the og:image to a single gzipped JSON file:
+
+    python scripts/precompute.py --output build/precomputed.json.gz
+    PRECOMPUTED_ARTIFACT=build/precomputed.json.gz python main.py
+
+Served from the artifact, a cold start imports neither pandas nor NumPy.
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.api_payloads import FRAME_BUILDERS, render_payload
+from components.chart_payload import build_chart_payload, build_home_summary
+from components.daily_index import build_daily_index
+from components.og_image import render_og_image
+from components.dataset import build_snapshot, get_uncertainty_bands
+from components.point_budgets import POINT_BUDGETS
+from components.precomputed import Artifact, write_artifact
+from routes.api import API_CHOICES
+
+DEFAULT_OUTPUT = os.path.join('build', 'precomputed.json.gz')
+
+def build_artifact(snapshot):
+    bands = get_uncertainty_bands(snapshot)
+    charts = {
+        budget: build_chart_payload(snapshot.df, snapshot.df_weighted_ma, budget, bands=bands)
+        for budget in POINT_BUDGETS + (0,)
+    }
+    api = {name: render_payload(snapshot, name, None, None, API_CHOICES[name][0]) for name in FRAME_BUILDERS}
+    summary = build_home_summary(snapshot.df_weighted_ma)
+    index = build_daily_index(snapshot.df_weighted_ma)
+    png = render_og_image(summary, index)
+    og_image = base64.b64encode(png).decode() if png else None
+    return Artifact(snapshot.version, snapshot.built_at, summary, charts, api, index.to_json(), og_image)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = build_snapshot()
+    artifact = build_artifact(snapshot)
+    write_artifact(artifact, args.output)
+    print(f"Wrote artifact {artifact.version} to {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.0f} KiB, {time.perf_counter() - start:.1f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Serve a directory of poll CSVs over HTTP, as a local stand-in for GitHub
+
+Supports ETag / If-None-Match and Last-Modified / If-Modified-Since so the
+conditional fetching in components/poll_source.py can be exercised offline:
+
+    python scripts/serve_polls.py path/to/dir --port 8001
+    POLLS_SOURCE=http://localhost:8001/italian_polls.csv python main.py
+"""
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import os
+
+class ConditionalHandler(SimpleHTTPRequestHandler):
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return None
+            self._etag = etag
+        return super().send_head()
+
+    def end_headers(self):
+        etag = getattr(self, '_etag', None)
+        if etag:
+            self.send_header('ETag', etag)
+            self._etag = None
+        super().end_headers()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve poll CSVs with HTTP validators")
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+
+    handler = partial(ConditionalHandler, directory=args.directory)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), handler)
+    print(f"Serving {os.path.abspath(args.directory)} on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Download the pinned third-party JS/CSS into static/vendor
+
+    python scripts/vendor_assets.py [--check]
+
+Fetches every file of utils.assets.VENDOR_FILES that is missing or does not
+match its sha256, and refuses to write a download whose hash differs from the
+pinned one. A file with no hash pinned yet is written and its sha256 printed,
+to be copied into VENDOR_FILES before committing it. With --check nothing is
+downloaded: the script exits with status 1 if any file is missing, altered or
+not pinned.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.assets import STATIC_DIR, VENDOR_FILES
+
+def download(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+def read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static', default=STATIC_DIR, help="directory VENDOR_FILES paths are relative to")
+    parser.add_argument('--check', action='store_true', help="only verify the files, exit 1 on any problem")
+    args = parser.parse_args()
+
+    problems = []
+    for path, (url, sha256) in VENDOR_FILES.items():
+        full_path = os.path.join(args.static, path)
+        data = read(full_path)
+        if data is not None and sha256 is not None and hashlib.sha256(data).hexdigest() == sha256:
+            continue
+        if args.check:
+            problems.append(f"{path}: {'missing' if data is None else 'no sha256 pinned' if sha256 is None else 'sha256 mismatch'}")
+            continue
+
+        if data is None or sha256 is not None:
+            try:
+                data = download(url)
+            except OSError as e:
+                problems.append(f"{path}: cannot download {url}: {e}")
+                continue
+        digest = hashlib.sha256(data).hexdigest()
+        if sha256 is not None and digest != sha256:
+            problems.append(f"{path}: {url} has sha256 {digest}, expected {sha256}")
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        print(f"{path:<70} {len(data):>9} bytes  sha256 {digest}")
+        if sha256 is None:
+            problems.append(f"{path}: no sha256 pinned, add {digest} to VENDOR_FILES")
+
+    if problems:
+        sys.exit("\n".join(problems))
+
+if __name__ == '__main__':
+    main()
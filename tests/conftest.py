@@ -0,0 +1,15 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.synthetic import generate_polls
+from components.data_processing import preprocess_polls, filter_data
+
+# Polls are filtered as of the last generated day, so none age out as time passes
+END_DATE = datetime(2026, 1, 1)
+
+@pytest.fixture(scope='session')
+def polls():
+    """Valid synthetic polls, sorted by date"""
+    df, party_columns = preprocess_polls(generate_polls(4000, seed=1, end_date=END_DATE))
+    return filter_data(df, party_columns, now=END_DATE).reset_index(drop=True)
@@ -0,0 +1,31 @@
+import errno
+import os
+import time
+
+from utils import cache_manager
+from utils.cache_manager import DiskTier
+
+def test_disk_tier_prunes_expired_then_oldest(tmp_path):
+    tier = DiskTier(str(tmp_path), ttl=60, max_bytes=250)
+    tier.set('stale', b'x' * 100)
+    os.utime(tier._path('stale'), (time.time() - 120,) * 2)
+    tier.set('old', b'x' * 100)
+    os.utime(tier._path('old'), (time.time() - 30,) * 2)
+    tier.set('new', b'x' * 100)
+    assert tier.get('stale') is None and tier.get('old') is not None
+
+    tier.set('newest', b'x' * 100)
+    assert tier.get('old') is None
+    assert tier.get('new') is not None and tier.get('newest') is not None
+
+def test_unwritable_disk_tier_disables_itself_once(tmp_path, monkeypatch, capsys):
+    def read_only(*args, **kwargs):
+        raise OSError(errno.EROFS, "Read-only file system")
+
+    monkeypatch.setattr(cache_manager.tempfile, 'mkstemp', read_only)
+    tier = DiskTier(str(tmp_path), ttl=60)
+    tier.set('a', b'data')
+    tier.set('b', b'data')
+    assert not tier.enabled
+    assert tier.get('a') is None
+    assert capsys.readouterr().out.count('Disk cache disabled') == 1
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.synthetic import PARTY_COLUMNS, PARTY_SHARES
+from components.data_processing import preprocess_polls, validate_polls, REJECTION_REASONS
+
+NOW = datetime(2026, 1, 1)
+
+def poll(date, pollster='SWG', shares=PARTY_SHARES, client='Rai'):
+    return {'Data Inserimento': date, 'Realizzatore': pollster, 'Committente': client, **dict(zip(PARTY_COLUMNS, shares))}
+
+def validate(rows):
+    df, party_columns = preprocess_polls(pd.DataFrame(rows))
+    return validate_polls(df, party_columns, now=NOW)
+
+def test_exact_reinsert_is_a_duplicate():
+    keep, report = validate([poll('10/12/2025'), poll('10/12/2025'), poll('10/12/2025', pollster='Tecnè')])
+    assert keep.tolist() == [True, False, True]
+    assert report['rejected']['duplicate'] == 1
+
+def test_reinsert_on_a_later_day_is_a_duplicate():
+    # The same poll inserted again days later, under another spelling of the pollster and client
+    keep, report = validate([poll('10/12/2025'), poll('12/12/2025'), poll('15/12/2025', pollster=' swg ', client='La7')])
+    assert keep.tolist() == [True, False, False]
+    assert report['rejected']['duplicate'] == 2
+
+def test_same_figures_weeks_apart_are_separate_polls():
+    keep, _ = validate([poll('01/12/2025'), poll('20/12/2025')])
+    assert keep.tolist() == [True, True]
+
+def test_rejected_counts_add_up_to_the_dropped_polls():
+    missing_pd = [None] + PARTY_SHARES[1:]
+    rows = [
+        poll('10/12/2025'),
+        poll('11/12/2025'),  # duplicate
+        poll('10/12/2025', pollster='EMG', shares=missing_pd),  # missing key party
+        poll('10/12/2025', pollster='Ipsos', shares=[share * 2 for share in PARTY_SHARES]),  # total out of range
+        poll('10/12/2021', pollster='Noto'),  # too old
+        poll('10/12/2021'),  # too old, not counted again as a duplicate
+    ]
+    keep, report = validate(rows)
+    assert report['rejected'] == {
+        'missing_key_parties': 1, 'total_out_of_range': 1, 'too_old': 2, 'duplicate': 1,
+    }
+    assert list(report['rejected']) == list(REJECTION_REASONS)
+    assert report['polls'] - report['kept'] == sum(report['rejected'].values()) == len(rows) - keep.sum()
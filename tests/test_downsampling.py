@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from components.chart_payload import build_chart_payload
+from components.downsampling import lttb_indices, shared_indices
+from components.point_budgets import normalize_point_budget, DEFAULT_POINT_BUDGET
+from moving_average import calculate_weighted_ma
+
+@pytest.mark.parametrize('requested, budget', [
+    ('100', 150), ('600', 600), ('601', 1200), ('5000', 1200), ('0', 0), ('many', DEFAULT_POINT_BUDGET),
+])
+def test_point_budget_is_clamped(requested, budget):
+    assert normalize_point_budget(requested) == budget
+
+@pytest.fixture(scope='module')
+def averages(polls):
+    return polls, calculate_weighted_ma(polls)
+
+def test_lttb_keeps_endpoints_and_budget():
+    x = np.arange(1000, dtype='float64')
+    rows = lttb_indices(x, np.sin(x / 50), 100)
+    assert len(rows) == 100
+    assert rows[0] == 0 and rows[-1] == 999
+    assert np.all(np.diff(rows) > 0)
+
+def test_shared_indices_honour_budget_across_series():
+    rng = np.random.default_rng(0)
+    x = np.arange(5000, dtype='float64')
+    series = [rng.normal(size=5000).cumsum() for _ in range(15)]
+    series[3][:2000] = np.nan  # a party without polls yet
+    assert len(shared_indices(x, series, 150)) <= 150
+
+@pytest.mark.parametrize('max_points', [150, 300, 600])
+def test_chart_payload_honours_point_budget(averages, max_points):
+    df, df_weighted_ma = averages
+    payload = build_chart_payload(df, df_weighted_ma, max_points)
+    # The axis also holds the days of the thinned polls, so lines are null on some of it
+    for series in payload['datasets'] + payload['coalitions']:
+        assert sum(value is not None for value in series['values']) <= max_points
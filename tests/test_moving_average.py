@@ -0,0 +1,34 @@
+import numpy as np
+
+from moving_average import IncrementalWeightedMA, calculate_weighted_ma
+
+def assert_same_averages(result, df):
+    expected = calculate_weighted_ma(df)
+    columns = [column for column in expected.columns if column.endswith('_MA')]
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_allclose(result[columns].to_numpy(dtype='float64'), expected[columns].to_numpy(dtype='float64'),
+                               rtol=1e-5, atol=1e-5)
+
+def test_appended_polls_match_full_recompute(polls):
+    updater = IncrementalWeightedMA()
+    updater.update(polls.iloc[:-200])
+    for end in (len(polls) - 150, len(polls) - 1, len(polls)):
+        result = updater.update(polls.iloc[:end])
+        assert updater.last_mode == 'incremental'
+        assert_same_averages(result, polls.iloc[:end])
+
+def test_dropped_and_appended_polls_match_full_recompute(polls):
+    updater = IncrementalWeightedMA()
+    updater.update(polls.iloc[:-100])
+    window = polls.iloc[40:]
+    result = updater.update(window)
+    assert updater.last_mode == 'incremental'
+    assert_same_averages(result, window)
+
+def test_out_of_order_poll_falls_back_to_full_recompute(polls):
+    updater = IncrementalWeightedMA()
+    updater.update(polls.iloc[:-100])
+    changed = polls.drop(index=polls.index[len(polls) // 2])
+    result = updater.update(changed)
+    assert updater.last_mode == 'full'
+    assert_same_averages(result, changed)
@@ -0,0 +1,24 @@
+import pytest
+
+from utils import refresh
+from utils.refresh import RefreshCoordinator
+
+def fail():
+    raise RuntimeError("poll source unreachable")
+
+def test_failed_refresh_backs_off_exponentially(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(refresh, 'get_redis_client', lambda: None)
+    monkeypatch.setattr(refresh.time, 'monotonic', lambda: clock[0])
+    coordinator = RefreshCoordinator('test:lock', retry_delay=30, max_retry_delay=100)
+
+    for delay in (30, 60, 100, 100):
+        with pytest.raises(RuntimeError):
+            coordinator.run(fail)
+        clock[0] += delay - 1
+        assert not coordinator.run_in_background(fail)
+        clock[0] += 1
+
+    assert coordinator.stats['backed_off'] == 4
+    coordinator.run(lambda: None)
+    assert coordinator._failures == 0
@@ -0,0 +1,156 @@
+"""Visit rollups in Redis: counters, unique visitor estimates and top referrers
+
+Each flushed batch of visits is aggregated in memory and written with one
+pipeline:
+
+    visits:day:<YYYYMMDD>        hash of page path -> views
+    visits:hour:<YYYYMMDDHH>     views in that hour
+    visits:uniques:<YYYYMMDD>    HyperLogLog of client IPs
+    visits:referrers:<YYYYMMDD>  sorted set of referring host -> views
+    visits:agents:<YYYYMMDD>     sorted set of browser family -> views
+
+Every key expires after its retention period and the sorted sets keep only
+their TOP_ENTRIES best entries, so memory stays bounded however much traffic
+there is. Days and hours are UTC.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+KEY_PREFIX = 'visits'
+DAY_RETENTION = 400  # days of per-day page views
+HOUR_RETENTION = 8  # days of per-hour page views
+DETAIL_RETENTION = 90  # days of unique visitors, referrers and browsers
+TOP_ENTRIES = 100  # referrers and browsers kept per day
+OWN_HOSTS = ('sondagginazionali.it', 'localhost', '127.0.0.1')
+DIRECT = '(direct)'
+
+# Checked in order: the first family with a matching token wins
+USER_AGENT_FAMILIES = (
+    ('bot', ('bot', 'crawler', 'spider', 'slurp', 'facebookexternalhit', 'preview')),
+    ('Edge', ('edg/',)),
+    ('Opera', ('opr/', 'opera')),
+    ('Samsung Internet', ('samsungbrowser/',)),
+    ('Firefox', ('firefox/', 'fxios/')),
+    ('Chrome', ('chrome/', 'crios/')),
+    ('Safari', ('safari/',)),
+    ('curl', ('curl/',)),
+    ('Python', ('python',)),
+)
+
+def day_key(kind, day):
+    return f"{KEY_PREFIX}:{kind}:{day.strftime('%Y%m%d')}"
+
+def hour_key(hour):
+    return f"{KEY_PREFIX}:hour:{hour.strftime('%Y%m%d%H')}"
+
+def user_agent_family(user_agent):
+    """Browser family of a User-Agent header, with ' (mobile)' for phones"""
+    agent = (user_agent or '').lower()
+    if not agent:
+        return 'unknown'
+    family = next((name for name, tokens in USER_AGENT_FAMILIES if any(token in agent for token in tokens)), 'other')
+    if family != 'bot' and 'mobile' in agent:
+        family += ' (mobile)'
+    return family
+
+def referrer_host(referrer):
+    """Host a visit came from, or None for links within the site"""
+    host = (urlparse(referrer).hostname or '') if referrer else ''
+    if not host:
+        return DIRECT
+    host = host.removeprefix('www.')
+    return None if host in OWN_HOSTS else host
+
+def visit_record(request, ip):
+    """The few fields of a visit the rollups need"""
+    headers = request.headers
+    return (
+        datetime.now(timezone.utc),
+        ip,
+        request.url.path,
+        referrer_host(headers.get('referer')),
+        user_agent_family(headers.get('user-agent')),
+    )
+
+def write_rollups(pipe, records):
+    """Queue the rollup updates for a batch of visit_record()s on a Redis pipeline"""
+    views = Counter()
+    hours = Counter()
+    uniques = defaultdict(set)
+    referrers = Counter()
+    agents = Counter()
+    for at, ip, path, referrer, agent in records:
+        day = at.date()
+        views[day, path] += 1
+        hours[at.replace(minute=0, second=0, microsecond=0)] += 1
+        if ip:
+            uniques[day].add(ip)
+        if referrer:
+            referrers[day, referrer] += 1
+        agents[day, agent] += 1
+
+    for (day, path), count in views.items():
+        pipe.hincrby(day_key('day', day), path, count)
+    for day in {day for day, _ in views}:
+        pipe.expire(day_key('day', day), DAY_RETENTION * 86400)
+    for hour, count in hours.items():
+        pipe.incrby(hour_key(hour), count)
+        pipe.expire(hour_key(hour), HOUR_RETENTION * 86400)
+    for day, ips in uniques.items():
+        pipe.pfadd(day_key('uniques', day), *ips)
+        pipe.expire(day_key('uniques', day), DETAIL_RETENTION * 86400)
+    for kind, counts in (('referrers', referrers), ('agents', agents)):
+        for (day, member), count in counts.items():
+            pipe.zincrby(day_key(kind, day), count, member)
+        for day in {day for day, _ in counts}:
+            pipe.zremrangebyrank(day_key(kind, day), 0, -TOP_ENTRIES - 1)
+            pipe.expire(day_key(kind, day), DETAIL_RETENTION * 86400)
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+def _top(rankings, limit):
+    totals = Counter()
+    for ranking in rankings:
+        for member, score in ranking:
+            totals[_decode(member)] += int(score)
+    return totals.most_common(limit)
+
+def read_stats(redis_client, days=30, hours=48, top=10, now=None):
+    """Page views, unique visitor estimates and top referrers/browsers of the last days, in one round trip"""
+    now = now or datetime.now(timezone.utc)
+    day_list = [(now - timedelta(days=offset)).date() for offset in range(days)]
+    hour_list = [(now - timedelta(hours=offset)).replace(minute=0, second=0, microsecond=0) for offset in range(hours)]
+    detail_days = day_list[:min(days, DETAIL_RETENTION)]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for day in day_list:
+        pipe.hgetall(day_key('day', day))
+        pipe.pfcount(day_key('uniques', day))
+    for window in (7, days):
+        pipe.pfcount(*[day_key('uniques', day) for day in detail_days[:window]])
+    pipe.mget([hour_key(hour) for hour in hour_list])
+    for kind in ('referrers', 'agents'):
+        for day in detail_days:
+            pipe.zrevrange(day_key(kind, day), 0, -1, withscores=True)
+    results = pipe.execute()
+
+    daily = []
+    for i, day in enumerate(day_list):
+        paths = {_decode(path): int(count) for path, count in results[2 * i].items()}
+        daily.append({'date': day.isoformat(), 'views': sum(paths.values()), 'uniques': results[2 * i + 1], 'paths': paths})
+    rest = results[2 * len(day_list):]
+    hourly = [
+        {'hour': hour.strftime('%Y-%m-%d %H:00'), 'views': int(count or 0)}
+        for hour, count in zip(hour_list, rest[2])
+    ]
+    rankings = rest[3:]
+    return {
+        'days': daily,
+        'hours': hourly,
+        'uniques': {'7d': rest[0], f'{days}d': rest[1]},
+        'views': {'7d': sum(day['views'] for day in daily[:7]), f'{days}d': sum(day['views'] for day in daily)},
+        'referrers': _top(rankings[:len(detail_days)], top),
+        'agents': _top(rankings[len(detail_days):], top),
+    }
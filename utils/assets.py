@@ -0,0 +1,173 @@
+"""Fingerprinted static assets, precompressed and served from memory
+
+Every file under static/ is loaded once, named after its content hash
+(styles.css -> styles.<hash>.css) and precompressed when it is a text format.
+Fingerprinted URLs never change meaning, so they are served as immutable;
+the plain names keep working with a short cache lifetime. Relative url()
+references inside stylesheets are rewritten to the fingerprinted names.
+
+Chart.js, its date-fns adapter and Font Awesome are vendored under
+static/vendor by scripts/vendor_assets.py, which checks every file against
+the sha256 in VENDOR_FILES. Pages never link a CDN: loading the registry
+fails when a vendored file is missing or does not match its hash.
+"""
+from dataclasses import dataclass
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+from typing import Dict, Optional
+
+from utils.page_cache import RenderedPage, build_page
+
+STATIC_DIR = "static"
+STATIC_PREFIX = "/static/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=3600"
+FINGERPRINT_LENGTH = 10
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'image/svg+xml', 'font/ttf', 'application/vnd.ms-fontobject')
+
+CHART_JS = 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist'
+DATE_FNS_ADAPTER = 'https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns@3.0.0/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4'
+
+# Path under static/ -> (pinned upstream URL, sha256 of the file, None until it is first vendored)
+VENDOR_FILES = {
+    'vendor/chart.js/chart.umd.js': (f'{CHART_JS}/chart.umd.js', None),
+    'vendor/chartjs-adapter-date-fns/chartjs-adapter-date-fns.bundle.min.js':
+        (f'{DATE_FNS_ADAPTER}/chartjs-adapter-date-fns.bundle.min.js', None),
+    'vendor/fontawesome/css/all.min.css': (
+        f'{FONT_AWESOME}/css/all.min.css', '99464ceb71bc9bbdcc72275faefe44f98eb5cbb6b5d8ee665b87b35376f1a96e'),
+    **{f'vendor/fontawesome/webfonts/{name}': (f'{FONT_AWESOME}/webfonts/{name}', digest) for name, digest in {
+        'fa-brands-400.eot': 'e4299464e7b012968eed63ac2db1c9509f56bca409ef9f71f2926a8c3c80b2a9',
+        'fa-brands-400.svg': 'a3b9817780214caf01e8aec20bcdc2305a1ff34a15fae81ecd0923df9cd5cd0a',
+        'fa-brands-400.ttf': 'cda59d6efffa685830fd95b55f64ae9cb51279cd34b2410b69f84c7ec30157d9',
+        'fa-brands-400.woff': 'f9217f66874b0c01cd8c10b6a295dbc4f609acb6f5adc41c37da46641b57eb02',
+        'fa-brands-400.woff2': '8ea8791754915a898a3100e63e32978a6d1763be6df8e73a39d3a90d691cdeef',
+        'fa-regular-400.eot': '79d088064beb3826054fb88165416235897a856ca952fca1498b1c59b16aaa48',
+        'fa-regular-400.svg': 'be0a084962d8066884f7fe9bd27ec16e51f5a93b72a502c92c5a24dc87eb2ebc',
+        'fa-regular-400.ttf': 'e8711bbb871afd8e9dea60e16d30f00c7e4837bbc9807065017475b849fa2313',
+        'fa-regular-400.woff': 'cb9e9e693192413cde2b1f21c1dc1d44b6fe7b27cc2b458e8b359d18f9ff8f4e',
+        'fa-regular-400.woff2': 'e42a88444448ac3d60549cc7c1ff2c8a9cac721034c073d80a14a44e79730cca',
+        'fa-solid-900.eot': '373c04fd2418f5c77eea49d514731058f1907a94ff3b4e5d7c3e5767e8b53d8b',
+        'fa-solid-900.svg': '9674eb1bd5504717903837093a67668ea88f2ed006d91367d0d4b7aa1f9211fc',
+        'fa-solid-900.ttf': 'af6397503fcefbd613976c21ad5c1e37298c18bbe07d096db03ccd3af6e05ba8',
+        'fa-solid-900.woff': '3f6d3488cf65374f6f676c315340b0ac2be832bd55240c809448e36ef9b96326',
+        'fa-solid-900.woff2': '9834b82ad26e2a37583d22676a12dd2eb0fe7c80356a2114d0db1aa8b3899537',
+    }.items()},
+}
+# Logical name pages link -> its path in VENDOR_FILES
+VENDOR_ASSETS = {
+    'chart.js': 'vendor/chart.js/chart.umd.js',
+    'chartjs-adapter-date-fns': 'vendor/chartjs-adapter-date-fns/chartjs-adapter-date-fns.bundle.min.js',
+    'font-awesome': 'vendor/fontawesome/css/all.min.css',
+}
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+@dataclass
+class Asset:
+    """A static file ready to serve"""
+    page: RenderedPage
+    fingerprinted: bool
+
+def _media_type(path: str) -> str:
+    media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if media_type.startswith('text/') or media_type in ('application/javascript', 'image/svg+xml'):
+        media_type += '; charset=utf-8'
+    return media_type
+
+def _fingerprint(path: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+def vendor_problems(files: Dict[str, bytes]) -> list:
+    """What is wrong with the VENDOR_FILES among files (path under static/ -> content)"""
+    problems = []
+    for path, (_, sha256) in VENDOR_FILES.items():
+        if path not in files:
+            problems.append(f"{path}: missing")
+        elif sha256 is not None and hashlib.sha256(files[path]).hexdigest() != sha256:
+            problems.append(f"{path}: sha256 does not match VENDOR_FILES")
+    return problems
+
+class AssetRegistry:
+    """All files under a static directory, keyed by plain and fingerprinted path"""
+    def __init__(self, directory: str = STATIC_DIR):
+        self.directory = directory
+        self.assets: Dict[str, Asset] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self._load()
+
+    def _read_files(self) -> Dict[str, bytes]:
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    files[path] = f.read()
+        return files
+
+    def _rewrite_css(self, path: str, css: bytes) -> bytes:
+        base = posixpath.dirname(path)
+
+        def replace(match):
+            quote, url = match.group(1), match.group(2)
+            if url.startswith(('data:', 'http:', 'https:', '//', '/')):
+                return match.group(0)
+            target, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            resolved = posixpath.normpath(posixpath.join(base, target))
+            if resolved not in self.fingerprints:
+                return match.group(0)
+            return f'url({quote}{STATIC_PREFIX}{self.fingerprints[resolved]}{suffix}{quote})'
+
+        return _CSS_URL.sub(replace, css.decode()).encode()
+
+    def _add(self, path: str, data: bytes) -> None:
+        media_type = _media_type(path)
+        page = build_page(data, media_type, compress=media_type.startswith(COMPRESSIBLE_TYPES))
+        fingerprinted = _fingerprint(path, data)
+        self.fingerprints[path] = fingerprinted
+        self.assets[path] = Asset(page, fingerprinted=False)
+        self.assets[fingerprinted] = Asset(page, fingerprinted=True)
+
+    def _load(self) -> None:
+        files = self._read_files()
+        if self.directory == STATIC_DIR:
+            problems = vendor_problems(files)
+            if problems:
+                raise RuntimeError(
+                    "Vendored assets are not usable, run scripts/vendor_assets.py:\n  " + "\n  ".join(problems))
+        # Stylesheets last, so the files they reference already have their fingerprints
+        for path in sorted(files, key=lambda path: path.endswith('.css')):
+            data = files[path]
+            if path.endswith('.css'):
+                data = self._rewrite_css(path, data)
+            self._add(path, data)
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL of a file under the static directory, or its plain URL if unknown"""
+        return STATIC_PREFIX + self.fingerprints.get(path, path)
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> AssetRegistry:
+    """The process-wide registry, loaded on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AssetRegistry()
+        return _registry
+
+def asset_url(name: str) -> str:
+    """URL for a static file path or a VENDOR_ASSETS name"""
+    return get_registry().url(VENDOR_ASSETS.get(name, name))
@@ -1,57 +1,290 @@
-import pickle
-from datetime import datetime, timedelta
+"""Tiered cache: in-process LRU, then local disk, then Redis
+
+Reads go through the tiers top down and a hit is copied into the tiers above
+it (read-through); writes go to every tier (write-through). Keys are
+namespaced and carry CACHE_SCHEMA_VERSION, so a change of encoding never
+reads entries written by an older one. When Redis is unreachable the client
+is in backoff and the Redis tier is skipped without waiting.
+"""
+from collections import OrderedDict
+import errno
+import hashlib
 import os
-from typing import Dict, Any, Optional
-import pandas as pd
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import counter
+from utils.redis_client import get_redis_client, report_redis_error, report_redis_success
 
 CACHE_DIR = "cache"
-CACHE_FILE = os.path.join(CACHE_DIR, "data_cache.pkl")
+TIERED_CACHE_DIR = os.path.join(CACHE_DIR, "tiered")
 CACHE_EXPIRY_HOURS = 6
+CACHE_SCHEMA_VERSION = 2
+DISK_CACHE_BYTES = 256 * 1024 * 1024  # per cache namespace
+
+cache_requests = counter('cache_requests_total', "Tiered cache lookups by cache, tier and hit/miss")
 
-def ensure_cache_dir():
+def ensure_cache_dir(path: str = CACHE_DIR) -> None:
     """Ensure the cache directory exists"""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-
-def save_to_cache(data: Dict[str, Any]) -> None:
-    """Save data to cache file with timestamp"""
-    ensure_cache_dir()
-    cache_data = {
-        'timestamp': datetime.now(),
-        'data': data
-    }
-    with open(CACHE_FILE, 'wb') as f:
-        pickle.dump(cache_data, f)
-    print(f"💾 Cache saved at {cache_data['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
-
-def load_from_cache() -> Optional[Dict[str, Any]]:
-    """Load data from cache if it exists and is not expired"""
-    if not os.path.exists(CACHE_FILE):
-        print("❌ No cache file found")
-        return None
-    
-    try:
-        with open(CACHE_FILE, 'rb') as f:
-            cache_data = pickle.load(f)
-        
-        # Check if cache is expired
-        cache_age = datetime.now() - cache_data['timestamp']
-        if cache_age > timedelta(hours=CACHE_EXPIRY_HOURS):
-            print(f"❌ Cache expired (age: {cache_age.total_seconds() / 3600:.1f} hours)")
+    os.makedirs(path, exist_ok=True)
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / lookups if lookups else None}
+
+class MemoryTier:
+    """LRU of decoded values bounded by total size and entry age"""
+    name = 'memory'
+
+    def __init__(self, max_bytes: int, ttl: float, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+class DiskTier:
+    """Encoded values as files under directory, expired by modification time
+
+    Every write prunes the expired files, then the oldest ones until the
+    directory fits in max_bytes. A directory that cannot be written, as on a
+    read-only filesystem, disables the tier for the life of the process.
+    """
+    name = 'disk'
+
+    def __init__(self, directory: str, ttl: float, max_bytes: int = DISK_CACHE_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.bin')
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
             return None
-        
-        print(f"✅ Using cache from {cache_data['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"⏰ Cache age: {cache_age.total_seconds() / 3600:.1f} hours")
-        return cache_data['data']
-    except (pickle.PickleError, KeyError, ValueError) as e:
-        print(f"❌ Cache loading error: {e}")
-        return None
-
-def cache_data(data: Dict[str, Any]) -> None:
-    """Cache the data directly"""
-    cache_dict = {
-        'df': data['df'],
-        'df_weighted_ma': data['df_weighted_ma'],
-        'all_party_columns': data['all_party_columns']
-    }
-    save_to_cache(cache_dict) 
\ No newline at end of file
+
+    def set(self, key: str, data: bytes) -> None:
+        if not self.enabled:
+            return
+        try:
+            ensure_cache_dir(self.directory)
+            fd, staging = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(staging, self._path(key))
+        except OSError as e:
+            if e.errno in (errno.EROFS, errno.EACCES, errno.EPERM):
+                self.enabled = False
+                print(f"Disk cache disabled, {self.directory} is not writable: {e}")
+            else:
+                print(f"Disk cache write error: {e}")
+            return
+        self.prune()
+
+    def prune(self) -> None:
+        """Remove the expired files, then the oldest until the rest fit in max_bytes"""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.bin'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        files.sort()
+        expires = time.time() - self.ttl
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if mtime >= expires and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+class RedisTier:
+    """Encoded values in Redis; skipped outright while the client is backing off"""
+    name = 'redis'
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            data = redis_client.get(key)
+            report_redis_success()
+            return data
+        except Exception as e:
+            print(f"Error retrieving {key}: {e}")
+            report_redis_error(e)
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            redis_client.setex(key, self.ttl, data)
+            report_redis_success()
+        except Exception as e:
+            print(f"Cache write error: {e}")
+            report_redis_error(e)
+
+    def delete(self, key: str) -> None:
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                redis_client.delete(key)
+            except Exception as e:
+                report_redis_error(e)
+
+class TieredCache:
+    """Memory, disk and Redis tiers behind one get/set
+
+    The memory tier keeps decoded values; disk and Redis keep the bytes made
+    by encode, turned back into values with decode.
+    """
+    def __init__(self, namespace: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 memory_bytes: int = 64 * 1024 * 1024, memory_ttl: float = 3600,
+                 disk_ttl: float = CACHE_EXPIRY_HOURS * 3600, redis_ttl: int = 2 * 86400,
+                 disk_bytes: int = DISK_CACHE_BYTES, sizeof: Callable[[Any], int] = len,
+                 disk_dir: str = TIERED_CACHE_DIR):
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.memory = MemoryTier(memory_bytes, memory_ttl, sizeof)
+        # One directory per namespace, so each tier prunes only its own files
+        self.disk = DiskTier(os.path.join(disk_dir, namespace.replace(':', '-')), disk_ttl, disk_bytes)
+        self.redis = RedisTier(redis_ttl)
+        self.stats = {tier.name: TierStats() for tier in (self.memory, self.disk, self.redis)}
+
+    def key(self, key: str) -> str:
+        """The versioned key stored in every tier, also usable in Redis pipelines"""
+        return f"{self.namespace}:v{CACHE_SCHEMA_VERSION}:{key}"
+
+    def _record(self, tier: str, hit: bool) -> None:
+        stats = self.stats[tier]
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+        cache_requests.inc(cache=self.namespace, tier=tier, result='hit' if hit else 'miss')
+
+    def get(self, key: str, load: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """Return the value for key from the first tier that has it, else load() written through"""
+        full_key = self.key(key)
+        value = self.memory.get(full_key)
+        self._record('memory', value is not None)
+        if value is not None:
+            return value
+
+        for tier, above in ((self.disk, ()), (self.redis, (self.disk,))):
+            data = tier.get(full_key)
+            self._record(tier.name, data is not None)
+            if data is None:
+                continue
+            try:
+                value = self.decode(data)
+            except Exception as e:
+                print(f"Could not decode {full_key} from {tier.name}: {e}")
+                tier.delete(full_key)
+                continue
+            for upper in above:
+                upper.set(full_key, data)
+            self.memory.set(full_key, value)
+            return value
+
+        if load is None:
+            return None
+        value = load()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any, redis: bool = True) -> bytes:
+        """Write value to every tier and return its encoding; redis=False when the caller writes Redis itself"""
+        full_key = self.key(key)
+        self.memory.set(full_key, value)
+        data = self.encode(value)
+        self.disk.set(full_key, data)
+        if redis:
+            self.redis.set(full_key, data)
+        return data
+
+    def delete(self, key: str) -> None:
+        full_key = self.key(key)
+        for tier in (self.memory, self.disk, self.redis):
+            tier.delete(full_key)
+
+    def stats_dict(self) -> Dict[str, Any]:
+        """Per-tier hits, misses and hit ratio"""
+        return {
+            **{name: stats.as_dict() for name, stats in self.stats.items()},
+            'memory_bytes': self.memory.size,
+        }
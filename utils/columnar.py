@@ -0,0 +1,143 @@
+"""Versioned columnar binary container for DataFrames
+
+Layout: MAGIC | u16 format version | u32 header length | JSON header | column buffers.
+The header holds the schema (name, dtype, encoding, offset and size of every
+buffer). Buffers are 8-byte aligned so numeric columns decode as zero-copy
+NumPy views over the payload. Dates without a time of day are stored as int32
+day numbers and decode as an int32 view too, so they are never copied into a
+worker; components.schema.date_column() widens them where they are used.
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'SNCF'
+FORMAT_VERSION = 2
+# 'days' columns: days since 1970-01-01, NAT_DAY for a missing date
+DAY_DTYPE = 'int32'
+NAT_DAY = np.iinfo(DAY_DTYPE).min
+_PREFIX = struct.Struct('<4sHI')
+_ALIGN = 8
+
+class ColumnarFormatError(ValueError):
+    """Raised when a payload is not a columnar container this version can read"""
+
+def _pad(size):
+    return (-size) % _ALIGN
+
+def _encode_column(series):
+    """Return (schema entry, buffer) for one column"""
+    dtype = series.dtype
+    entry = {'name': series.name, 'dtype': str(dtype)}
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        entry['encoding'] = 'category'
+        entry['categories'] = [str(c) for c in dtype.categories]
+        entry['ordered'] = bool(dtype.ordered)
+        codes = series.cat.codes.to_numpy()
+        entry['codes_dtype'] = str(codes.dtype)
+        return entry, codes.tobytes()
+
+    if pd.api.types.is_datetime64_dtype(dtype):
+        values = series.to_numpy()
+        days = values.astype('datetime64[D]')
+        observed = ~np.isnat(days)
+        if (days[observed] == values[observed]).all() and _fits_int32(days[observed].view('int64')):
+            entry['encoding'] = 'days'
+            return entry, np.where(observed, days.view('int64'), NAT_DAY).astype(DAY_DTYPE).tobytes()
+        entry['encoding'] = 'datetime'
+        return entry, values.view('int64').tobytes()
+
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        entry['encoding'] = 'plain'
+        return entry, series.to_numpy().tobytes()
+
+    values = series.to_numpy(dtype=object)
+    is_missing = pd.isna(values)
+    if all(isinstance(v, str) for v in values[~is_missing]):
+        # Strings are dictionary encoded, the dictionary lives in the header
+        codes, uniques = pd.factorize(values)
+        entry['encoding'] = 'dictionary'
+        entry['categories'] = [str(u) for u in uniques]
+        return entry, codes.astype('int32').tobytes()
+
+    entry['encoding'] = 'json'
+    cleaned = [None if missing else v for v, missing in zip(values.tolist(), is_missing)]
+    return entry, json.dumps(cleaned).encode()
+
+def _fits_int32(values):
+    return len(values) == 0 or (values.min() > NAT_DAY and values.max() <= np.iinfo(DAY_DTYPE).max)
+
+def _decode_column(entry, buffer):
+    encoding = entry['encoding']
+    if encoding == 'plain':
+        return np.frombuffer(buffer, dtype=entry['dtype'])
+    if encoding == 'datetime':
+        return np.frombuffer(buffer, dtype='int64').view(entry['dtype'])
+    if encoding == 'days':
+        return np.frombuffer(buffer, dtype=DAY_DTYPE)
+    if encoding == 'category':
+        codes = np.frombuffer(buffer, dtype=entry['codes_dtype'])
+        return pd.Categorical.from_codes(codes, categories=entry['categories'], ordered=entry['ordered'])
+    if encoding == 'dictionary':
+        codes = np.frombuffer(buffer, dtype='int32')
+        categories = np.array(entry['categories'] + [None], dtype=object)
+        values = categories[codes]  # code -1 picks the trailing None
+        return pd.array(values, dtype=entry['dtype'])
+    if encoding == 'json':
+        return pd.array(json.loads(bytes(buffer)), dtype=entry['dtype'])
+    raise ColumnarFormatError(f"Unknown column encoding {encoding!r}")
+
+def encode_frame(df, compress=False, level=1):
+    """Serialize df column by column; the index is not kept"""
+    columns = []
+    buffers = []
+    offset = 0
+    for name in df.columns:
+        entry, buffer = _encode_column(df[name])
+        entry.update({'offset': offset, 'size': len(buffer)})
+        columns.append(entry)
+        buffers.append(buffer + b'\0' * _pad(len(buffer)))
+        offset += len(buffer) + _pad(len(buffer))
+
+    payload = b''.join(buffers)
+    if compress:
+        payload = zlib.compress(payload, level)
+    header = json.dumps({
+        'rows': len(df),
+        'columns': columns,
+        'compression': 'zlib' if compress else None,
+    }).encode()
+    header += b' ' * _pad(_PREFIX.size + len(header))
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)) + header + payload
+
+def read_header(data):
+    """Return (header, payload start) of an encoded frame"""
+    data = memoryview(data)
+    if len(data) < _PREFIX.size:
+        raise ColumnarFormatError("Payload too short")
+    magic, version, header_size = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ColumnarFormatError("Not a columnar frame")
+    if version > FORMAT_VERSION:
+        raise ColumnarFormatError(f"Unsupported format version {version}")
+    start = _PREFIX.size + header_size
+    return json.loads(bytes(data[_PREFIX.size:start])), start
+
+def decode_frame(data):
+    """Rebuild the DataFrame; uncompressed numeric columns are views over data"""
+    header, start = read_header(data)
+    payload = memoryview(data)[start:]
+    if header['compression'] == 'zlib':
+        payload = memoryview(zlib.decompress(payload))
+    elif header['compression'] is not None:
+        raise ColumnarFormatError(f"Unknown compression {header['compression']!r}")
+
+    columns = {
+        entry['name']: _decode_column(entry, payload[entry['offset']:entry['offset'] + entry['size']])
+        for entry in header['columns']
+    }
+    return pd.DataFrame(columns, copy=False) if columns else pd.DataFrame(index=range(header['rows']))
@@ -1,22 +1,18 @@
-from datetime import datetime
-import json
-import os
-import redis
-
-def get_redis_connection():
-    redis_url = os.environ.get('REDIS_URL')
-    if not redis_url:
-        return None
-    try:
-        if redis_url.startswith('redis://'):
-            redis_url = redis_url.replace('redis://', 'rediss://', 1)
-        return redis.from_url(
-            redis_url,
-            decode_responses=True
-        )
-    except Exception as e:
-        print(f"Redis connection error: {e}")
-        return None
+import atexit
+import queue
+import threading
+import time
+from utils.analytics import visit_record, write_rollups
+from utils.redis_client import get_redis_client, redis_configured, report_redis_error
+
+QUEUE_SIZE = 5000
+FLUSH_BATCH_SIZE = 100
+FLUSH_INTERVAL = 2.0  # seconds
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_flusher = None
+_stats_lock = threading.Lock()
+_stats = {'flushed': 0, 'batches': 0, 'dropped': 0}
 
 def get_client_ip(request):
     """Extract client IP from various headers that might be present"""
@@ -39,25 +35,85 @@ def get_client_ip(request):
     return None
 
 def log_visit(data):
-    redis_client = get_redis_connection()
-    if not redis_client:
-        print("Redis not configured, skipping logging")
+    """Queue a visit for the background flusher without touching Redis"""
+    if not redis_configured() or 'request' not in data:
         return
 
+    request = data['request']
+    record = visit_record(request, get_client_ip(request))
+
+    _ensure_flusher()
     try:
-        timestamp = datetime.now().isoformat()
-        
-        # Clean up the data to ensure it's serializable
-        clean_data = {
-            'timestamp': timestamp,
-            'ip': get_client_ip(data.get('request')) if 'request' in data else None,
-            'headers': data.get('headers', {})
-        }
-        
-        # Add to a Redis list with key 'visit_logs'
-        redis_client.lpush('visit_logs', json.dumps(clean_data))
-        
-        # Optional: Trim the log to keep only last 1000 entries
-        redis_client.ltrim('visit_logs', 0, 999)
+        _queue.put_nowait(record)
+    except queue.Full:
+        with _stats_lock:
+            _stats['dropped'] += 1
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _stats_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name='visit-log-flusher', daemon=True)
+            _flusher.start()
+
+def _flush_loop():
+    while True:
+        batch = _next_batch()
+        if batch:
+            _write_batch(batch)
+
+def _next_batch():
+    """Block until FLUSH_BATCH_SIZE records are queued or FLUSH_INTERVAL has passed"""
+    batch = []
+    deadline = time.monotonic() + FLUSH_INTERVAL
+    while len(batch) < FLUSH_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _write_batch(batch):
+    redis_client = get_redis_client()
+    if not redis_client:
+        with _stats_lock:
+            _stats['dropped'] += len(batch)
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        write_rollups(pipe, batch)
+        pipe.execute()
+        with _stats_lock:
+            _stats['flushed'] += len(batch)
+            _stats['batches'] += 1
     except Exception as e:
-        print(f"Error logging visit: {e}")
\ No newline at end of file
+        print(f"Error recording visits: {e}")
+        report_redis_error(e)
+        with _stats_lock:
+            _stats['dropped'] += len(batch)
+
+def flush_visits():
+    """Write out everything still queued, e.g. before the process exits"""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+        if len(batch) == FLUSH_BATCH_SIZE:
+            _write_batch(batch)
+            batch = []
+    if batch:
+        _write_batch(batch)
+
+def visit_log_stats():
+    """Counters for the visit log queue"""
+    with _stats_lock:
+        return {**_stats, 'queued': _queue.qsize(), 'capacity': QUEUE_SIZE}
+
+atexit.register(flush_visits)
@@ -0,0 +1,160 @@
+"""In-process counters and histograms, exposed as Prometheus text and Server-Timing"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+PREFIX = 'sondaggi_'
+# Seconds; from a Redis round trip up to a full rebuild
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_metrics = {}
+_gauges = {}
+# Stage durations of the request being served, for its Server-Timing header
+_request_timings = ContextVar('request_timings', default=None)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Counter:
+    """Monotonic count per label set"""
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name, self.help = PREFIX + name, help
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with _lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(key)} {value}' for key, value in sorted(values.items())]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name, self.help = PREFIX + name, help
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with _lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+def counter(name, help):
+    """Return the counter called name, creating it on first use"""
+    with _lock:
+        return _metrics.setdefault(PREFIX + name, Counter(name, help))
+
+def histogram(name, help, buckets=DEFAULT_BUCKETS):
+    """Return the histogram called name, creating it on first use"""
+    with _lock:
+        return _metrics.setdefault(PREFIX + name, Histogram(name, help, buckets))
+
+def gauge(name, help, read):
+    """Register read(), returning a number or a {labels tuple: number} dict, as a gauge"""
+    with _lock:
+        _gauges[PREFIX + name] = (help, read)
+
+stage_seconds = histogram('stage_seconds', "Time spent in each stage of serving or rebuilding")
+request_seconds = histogram('request_seconds', "Time to the first response byte, per route")
+
+@contextmanager
+def timed(stage):
+    """Time a block into stage_seconds and the current request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        metrics = list(_metrics.values())
+        gauges = list(_gauges.items())
+    lines = []
+    for metric in metrics:
+        lines += [f'# HELP {metric.name} {metric.help}', f'# TYPE {metric.name} {metric.kind}']
+        lines += metric.samples()
+    for name, (help, read) in gauges:
+        try:
+            value = read()
+        except Exception as e:
+            print(f"Could not read gauge {name}: {e}")
+            continue
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+        values = value if isinstance(value, dict) else {(): value}
+        lines += [f'{name}{_format_labels(key)} {float(v)}' for key, v in values.items() if v is not None]
+    return '\n'.join(lines) + '\n'
+
+def _server_timing(timings, total):
+    entries = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+class TimingMiddleware:
+    """ASGI middleware adding Server-Timing to responses and timing each route"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                total = time.perf_counter() - start
+                route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+                request_seconds.observe(total, route=route)
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', _server_timing(timings, total).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
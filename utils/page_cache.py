@@ -0,0 +1,139 @@
+"""In-process store of pre-rendered, precompressed pages"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Union
+import gzip
+import hashlib
+import threading
+
+from starlette.responses import Response
+
+from utils.metrics import counter, gauge, timed
+
+try:
+    import brotli
+except ImportError:  # a requirement, but serving gzip only beats not starting
+    print("brotli is not installed: pages are served gzip-compressed only (pip install brotli)")
+    brotli = None
+
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+# Pages are compressed on the first request of a data version, so favour speed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+@dataclass
+class RenderedPage:
+    """A page body with its precompressed variants and validators"""
+    body: bytes
+    etag: str
+    media_type: str = "text/html; charset=utf-8"
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(variant) for variant in self.encoded.values())
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        if not encoding:
+            return f'"{self.etag}"'
+        return f'"{self.etag}-{encoding}"'
+
+_pages: "OrderedDict[str, RenderedPage]" = OrderedDict()
+_cached_bytes = 0
+_lock = threading.Lock()
+page_cache_requests = counter('page_cache_requests_total', "Rendered page lookups by page kind and hit/miss")
+gauge('page_cache_bytes', "Bytes held by the rendered page cache", lambda: _cached_bytes)
+
+def build_page(body: Union[str, bytes], media_type: str = "text/html; charset=utf-8",
+               compress: bool = True) -> RenderedPage:
+    """Encode a rendered body once and precompute its gzip/brotli variants"""
+    with timed('compress'):
+        raw = body.encode() if isinstance(body, str) else body
+        page = RenderedPage(body=raw, etag=hashlib.sha1(raw).hexdigest()[:20], media_type=media_type)
+        if not compress:
+            return page
+        page.encoded['gzip'] = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            page.encoded['br'] = brotli.compress(raw, quality=BROTLI_QUALITY)
+    return page
+
+def _lookup(key: str) -> Optional[RenderedPage]:
+    with _lock:
+        page = _pages.get(key)
+        if page is not None:
+            _pages.move_to_end(key)
+        return page
+
+def _page_kind(key: str) -> str:
+    return key.split(':', 1)[0]
+
+def get_page(key: str) -> Optional[RenderedPage]:
+    """Return the page rendered for key, if any
+
+    Only hits are counted here; a miss is counted by the get_or_render that follows.
+    """
+    page = _lookup(key)
+    if page is not None:
+        page_cache_requests.inc(page=_page_kind(key), result='hit')
+    return page
+
+def store_page(key: str, page: RenderedPage) -> RenderedPage:
+    """Keep page for key, evicting least recently used pages past MAX_CACHED_BYTES"""
+    global _cached_bytes
+    with _lock:
+        previous = _pages.pop(key, None)
+        if previous is not None:
+            _cached_bytes -= previous.size
+        _pages[key] = page
+        _cached_bytes += page.size
+        while _cached_bytes > MAX_CACHED_BYTES and len(_pages) > 1:
+            _, evicted = _pages.popitem(last=False)
+            _cached_bytes -= evicted.size
+    return page
+
+def get_or_render(key: str, render: Callable[[], str],
+                  media_type: str = "text/html; charset=utf-8") -> RenderedPage:
+    """Return the cached page for key, rendering it only on a miss"""
+    page = _lookup(key)
+    if page is not None:
+        page_cache_requests.inc(page=_page_kind(key), result='hit')
+        return page
+    page_cache_requests.inc(page=_page_kind(key), result='miss')
+    return store_page(key, build_page(render(), media_type))
+
+def _accepted_encodings(request) -> set:
+    accepted = set()
+    for part in request.headers.get('accept-encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def _etag_matches(request, page: RenderedPage) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    known = {page.etag_for(None)} | {page.etag_for(encoding) for encoding in page.encoded}
+    return bool(tags & known)
+
+def page_response(request, page: RenderedPage, cache_control: str = "no-cache",
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve page in the best accepted encoding, or 304 when the client already has it"""
+    accepted = _accepted_encodings(request)
+    encoding = next((e for e in ('br', 'gzip') if e in page.encoded and e in accepted), None)
+    headers = {
+        **(headers or {}),
+        'ETag': page.etag_for(encoding),
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding',
+    }
+    if _etag_matches(request, page):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        return Response(page.encoded[encoding], headers=headers, media_type=page.media_type)
+    return Response(page.body, headers=headers, media_type=page.media_type)
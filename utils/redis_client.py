@@ -0,0 +1,109 @@
+"""Shared Redis client backed by a single bounded connection pool"""
+import os
+import threading
+import time
+
+import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+from utils.metrics import counter
+
+MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 10))
+POOL_TIMEOUT = 2  # seconds to wait for a free connection
+SOCKET_TIMEOUT = 2
+HEALTH_CHECK_INTERVAL = 30
+BACKOFF_BASE = 1  # seconds Redis is skipped after the first failure
+BACKOFF_CAP = 60
+
+_lock = threading.Lock()
+_client = None
+_pool = None
+_failures = 0
+_retry_at = 0.0
+_stats = {'clients_served': 0, 'connection_errors': 0, 'skipped_during_backoff': 0}
+redis_errors = counter('redis_errors_total', "Failed Redis commands by exception type")
+
+def _redis_url():
+    redis_url = os.environ.get('REDIS_URL')
+    if redis_url and redis_url.startswith('redis://'):
+        redis_url = redis_url.replace('redis://', 'rediss://', 1)
+    return redis_url
+
+def _build_client(redis_url):
+    global _pool
+    _pool = redis.BlockingConnectionPool.from_url(
+        redis_url,
+        max_connections=MAX_CONNECTIONS,
+        timeout=POOL_TIMEOUT,
+        socket_timeout=SOCKET_TIMEOUT,
+        socket_connect_timeout=SOCKET_TIMEOUT,
+        health_check_interval=HEALTH_CHECK_INTERVAL,
+        retry=Retry(ExponentialBackoff(cap=0.5, base=0.05), 2),
+        retry_on_timeout=True,
+    )
+    return redis.Redis(connection_pool=_pool)
+
+def redis_configured():
+    """Whether a Redis URL is configured at all"""
+    return bool(os.environ.get('REDIS_URL'))
+
+def get_redis_client():
+    """Return the process-wide Redis client, or None if unconfigured or backing off"""
+    global _client
+    redis_url = _redis_url()
+    if not redis_url:
+        return None
+    with _lock:
+        if time.monotonic() < _retry_at:
+            _stats['skipped_during_backoff'] += 1
+            return None
+        if _client is None:
+            try:
+                _client = _build_client(redis_url)
+            except Exception as e:
+                print(f"Redis connection error: {e}")
+                _register_failure()
+                return None
+        _stats['clients_served'] += 1
+        return _client
+
+def _register_failure():
+    global _failures, _retry_at
+    _failures += 1
+    _stats['connection_errors'] += 1
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (_failures - 1))
+    _retry_at = time.monotonic() + delay
+
+def report_redis_error(error):
+    """Start or extend the reconnect backoff when error means Redis is unreachable"""
+    redis_errors.inc(error=type(error).__name__)
+    if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+        with _lock:
+            _register_failure()
+
+def report_redis_success():
+    """Reset the reconnect backoff after a successful command"""
+    global _failures, _retry_at
+    if _failures:
+        with _lock:
+            _failures = 0
+            _retry_at = 0.0
+
+def pool_stats():
+    """Connection pool usage, to check that connections are reused under load"""
+    with _lock:
+        stats = dict(_stats)
+        stats['backing_off'] = time.monotonic() < _retry_at
+        stats['consecutive_failures'] = _failures
+        if _pool is None:
+            return stats
+        created = [c for c in getattr(_pool, '_connections', []) if c is not None]
+        idle = [c for c in getattr(_pool.pool, 'queue', []) if c is not None]
+        stats.update({
+            'max_connections': _pool.max_connections,
+            'created_connections': len(created),
+            'idle_connections': len(idle),
+            'in_use_connections': len(created) - len(idle),
+        })
+        return stats
@@ -0,0 +1,144 @@
+"""Single-flight coordination of expensive refreshes"""
+from contextlib import contextmanager
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no file locks outside POSIX; the local lock still applies
+    fcntl = None
+
+from utils.redis_client import get_redis_client, report_redis_error
+
+class RefreshCoordinator:
+    """Lets one worker at a time run a refresh
+
+    Threads of the same process are serialized with a local lock. Across
+    processes a Redis lock is used when Redis is reachable; without Redis a
+    lock_file, if given, serializes the processes sharing it, and otherwise the
+    local lock is all there is.
+
+    After a failed refresh, background refreshes back off: none is started for
+    retry_delay seconds, doubling with each consecutive failure up to
+    max_retry_delay, and a success resets the delay.
+    """
+    def __init__(self, lock_key, lock_timeout=300, lock_file=None, retry_delay=30, max_retry_delay=900):
+        self.lock_key = lock_key
+        self.lock_timeout = lock_timeout
+        self.lock_file = lock_file
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._local = threading.Lock()
+        self._failures = 0  # consecutive
+        self._retry_at = 0.0
+        self.stats = {'refreshes': 0, 'skipped': 0, 'failures': 0, 'backed_off': 0}
+
+    @contextmanager
+    def hold(self, blocking=False, wait_timeout=None):
+        """Yield True if this caller owns the refresh, False if someone else does"""
+        timeout = -1 if wait_timeout is None else wait_timeout
+        if not self._local.acquire(blocking=blocking, timeout=timeout if blocking else -1):
+            yield False
+            return
+        try:
+            remote = self._acquire_remote(blocking, wait_timeout)
+            if remote is None and self.lock_file and fcntl is not None:
+                remote = self._acquire_file(blocking, wait_timeout)
+            if remote is False:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                if remote is not None:
+                    self._release_remote(remote)
+        finally:
+            self._local.release()
+
+    def _acquire_remote(self, blocking, wait_timeout):
+        """Return the Redis lock, None when Redis is unavailable, False if taken"""
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            lock = redis_client.lock(self.lock_key, timeout=self.lock_timeout, blocking_timeout=wait_timeout)
+            return lock if lock.acquire(blocking=blocking) else False
+        except Exception as e:
+            print(f"Refresh lock error: {e}")
+            report_redis_error(e)
+            return None
+
+    def _acquire_file(self, blocking, wait_timeout):
+        """Return an open file holding the lock_file lock, or False if taken"""
+        f = open(self.lock_file, 'a')
+        deadline = None if wait_timeout is None else time.monotonic() + wait_timeout
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    f.close()
+                    return False
+                time.sleep(0.05)
+
+    def _release_remote(self, lock):
+        if hasattr(lock, 'fileno'):
+            # Closing the file drops the flock
+            lock.close()
+            return
+        try:
+            lock.release()
+        except Exception as e:
+            # The lock expired or Redis went away; it times out on its own
+            print(f"Refresh lock release error: {e}")
+
+    def run(self, refresh, blocking=False, wait_timeout=None):
+        """Run refresh if no one else is; return whether it ran"""
+        with self.hold(blocking, wait_timeout) as owner:
+            if not owner:
+                self.stats['skipped'] += 1
+                return False
+            try:
+                refresh()
+                self.stats['refreshes'] += 1
+                self._failures = 0
+            except Exception as e:
+                self.stats['failures'] += 1
+                self._failures += 1
+                delay = min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay)
+                self._retry_at = time.monotonic() + delay
+                print(f"Refresh failed: {e}; no background retry for {delay:.0f}s")
+                raise
+            return True
+
+    def run_in_background(self, refresh):
+        """Start refresh on a daemon thread unless one is running here or a failure is backing off"""
+        if self._local.locked():
+            self.stats['skipped'] += 1
+            return False
+        if self._failures and time.monotonic() < self._retry_at:
+            self.stats['backed_off'] += 1
+            return False
+        thread = threading.Thread(target=self._run_quietly, args=(refresh,), daemon=True)
+        thread.start()
+        return True
+
+    def _run_quietly(self, refresh):
+        try:
+            self.run(refresh)
+        except Exception:
+            pass
+
+def start_scheduler(interval, task, name='refresh-scheduler'):
+    """Call task every interval seconds on a daemon thread"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                task()
+            except Exception as e:
+                print(f"Scheduled task {name} failed: {e}")
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread